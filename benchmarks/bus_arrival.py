@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Time and measure the memory of turning a saved DataMall BusArrivalv2 response into the
+bus reply, BusArrival records (parse_bus_arrival + format_buses) against the previous
+pandas DataFrame path
+
+    python benchmarks/bus_arrival.py [bus_arrival.json] [repeat]
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from news_bus_weather import parse_bus_arrival
+from reply_action import format_buses
+
+DEFAULT_PAYLOAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'bus_arrival.json')
+
+
+def pandas_reply(content, bus_list=None):
+    """
+    the previous get_next_bus and reply_bus, one DataFrame per request
+
+    :param content: decoded BusArrivalv2 response
+    :type content: dict
+
+    :param bus_list: list of bus to watch, if None, all will be taken
+    :type bus_list: list
+
+    :return: text message
+    """
+    buses_info = []
+    for service in content['Services']:
+        arrivals = []
+        for i in ('NextBus', 'NextBus2', 'NextBus3'):
+            try:
+                arrivals.append(pd.to_datetime(service[i]['EstimatedArrival'], format='%Y-%m-%dT%H:%M:%S+08:00'))
+            except Exception:
+                arrivals.append(None)
+        buses_info.append([service['ServiceNo']] + arrivals)
+
+    res_df = pd.DataFrame(buses_info, columns=['bus_number', 'first_arrival', 'second_arrival', 'third_arrival'])
+    if bus_list:
+        res_df = res_df.loc[res_df['bus_number'].str.lower().isin(bus_list)]
+
+    res_df['current_time'] = pd.Timestamp.now()
+    res_df['first_interval'] = (res_df['first_arrival'] - res_df['current_time']).dt.seconds
+    res_df['second_interval'] = (res_df['second_arrival'] - res_df['current_time']).dt.seconds
+    res_df['third_interval'] = (res_df['third_arrival'] - res_df['current_time']).dt.seconds
+
+    message = ""
+    for i in res_df[['bus_number', 'first_interval', 'second_interval', 'third_interval']].iterrows():
+        bus_record = list(i[1])
+        bus_record = [bus_record[0]] + [86400 - i if i > 80000 else i for i in bus_record[1:]]
+        message += "巴士: {}\n下一班 {} 分钟\n下下一班 {} 分钟\n下下下一班 {} 分钟\n========\n". \
+            format(bus_record[0], round(bus_record[1] / 60, 1), round(bus_record[2] / 60, 1),
+                   round(bus_record[3] / 60, 1))
+    return message
+
+
+def records_reply(content, bus_list=None):
+    """
+    the current path, slotted BusArrival records
+
+    :param content: decoded BusArrivalv2 response
+    :type content: dict
+
+    :param bus_list: list of bus to watch, if None, all will be taken
+    :type bus_list: list
+
+    :return: text message
+    """
+    buses_info = parse_bus_arrival(content)
+    if bus_list:
+        buses_info = [i for i in buses_info if i.bus_number.lower() in bus_list]
+    return format_buses(buses_info, time.time())
+
+
+def measure(func, content, repeat):
+    """
+    latency and allocations of one parse-to-message run
+
+    :param func: reply function
+    :type func: callable
+
+    :param content: decoded BusArrivalv2 response
+    :type content: dict
+
+    :param repeat: number of timed runs
+    :type repeat: int
+
+    :return: list of seconds per run, peak bytes allocated during a run
+    """
+    func(content)
+    timings = timeit.repeat(lambda: func(content), number=1, repeat=repeat)
+
+    tracemalloc.start()
+    func(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return timings, peak
+
+
+def main(path, repeat):
+    with open(path, encoding='utf8') as f:
+        content = json.load(f)
+
+    print("{} services".format(len(content['Services'])))
+    for name, func in (('pandas', pandas_reply), ('records', records_reply)):
+        timings, peak = measure(func, content, repeat)
+        print("{}: median {:.3f} ms, min {:.3f} ms, peak {:.1f} KiB allocated".format(
+            name, statistics.median(timings) * 1000, min(timings) * 1000, peak / 1024))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PAYLOAD, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
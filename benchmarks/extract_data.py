@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Time extract_data on a saved JobStreet search result page, one script call for every
+panel (bulk=True) against one webdriver call per field (bulk=False)
+
+    python benchmarks/extract_data.py [saved_results.html] [repeat]
+
+Chrome and the driver at config.driver_path are required.
+"""
+
+import os
+import statistics
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import config
+from driver_pool import create_driver
+from jobstreet import extract_data
+
+DEFAULT_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'jobstreet_results.html')
+
+
+def time_extract(driver, bulk, repeat):
+    """
+    time extract_data on the page loaded in the driver
+
+    :param driver: webdriver on a search result page
+    :type driver: webdriver
+
+    :param bulk: extract all panels with a single script call
+    :type bulk: bool
+
+    :param repeat: number of timed runs
+    :type repeat: int
+
+    :return: list of seconds per run, extracted dataframe
+    """
+    res_df = extract_data(driver, bulk=bulk)[1]
+    timings = timeit.repeat(lambda: extract_data(driver, bulk=bulk), number=1, repeat=repeat)
+    return timings, res_df
+
+
+def main(page, repeat):
+    driver = create_driver(config.driver_path)
+    try:
+        driver.get('file://' + os.path.abspath(page))
+
+        results = {}
+        for bulk in (False, True):
+            timings, res_df = time_extract(driver, bulk, repeat)
+            results[bulk] = res_df
+            print("bulk={}: {} panels, median {:.1f} ms, min {:.1f} ms".format(
+                bulk, len(res_df), statistics.median(timings) * 1000, min(timings) * 1000))
+
+        # innerText and WebElement.text may differ in surrounding whitespace only
+        same = results[True].fillna('').apply(lambda i: i.str.strip()).equals(
+            results[False].fillna('').apply(lambda i: i.str.strip()))
+        print("same result: {}".format(same))
+    finally:
+        driver.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PAGE, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+import json
+import logging
+import os
+import pickle
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+def read_datamall_dump(path):
+    """
+    read a DataMall BusStops / BusRoutes dump, either the list of records or the raw
+    api responses with the records under 'value'
+
+    :param path: json file
+    :type path: str
+
+    :return: list of records
+    """
+    with open(path, encoding='utf8') as f:
+        content = json.load(f)
+
+    if isinstance(content, dict):
+        return content['value']
+
+    records = []
+    for page in content:
+        records += page['value'] if isinstance(page, dict) and 'value' in page else [page]
+    return records
+
+
+class BusIndex:
+    """
+    Local index of bus stops and the services calling at them, to look up and
+    validate a stop without asking DataMall.
+    """
+
+    def __init__(self, stops, stop_services):
+        """
+        :param stops: bus stop code to (description, road name)
+        :type stops: dict
+
+        :param stop_services: bus stop code to set of lower case service numbers
+        :type stop_services: dict
+        """
+        self.stops = stops
+        self.stop_services = stop_services
+        self.services = set().union(*stop_services.values()) if stop_services else set()
+        # sorted lower case names for prefix search
+        self._names = sorted((name.lower(), code) for code, (name, _) in stops.items())
+
+    @classmethod
+    def from_datamall(cls, stops_path, routes_path):
+        """
+        build the index from DataMall BusStops and BusRoutes dumps
+
+        :param stops_path: BusStops json dump
+        :type stops_path: str
+
+        :param routes_path: BusRoutes json dump
+        :type routes_path: str
+
+        :return: BusIndex
+        """
+        stops = {i['BusStopCode']: (i['Description'], i['RoadName']) for i in read_datamall_dump(stops_path)}
+
+        stop_services = {}
+        for route in read_datamall_dump(routes_path):
+            stop_services.setdefault(route['BusStopCode'], set()).add(route['ServiceNo'].lower())
+
+        return cls(stops, {code: frozenset(services) for code, services in stop_services.items()})
+
+    def save(self, path):
+        """
+        save a compiled index that loads quickly
+
+        :param path: index file
+        :type path: str
+
+        :return: None
+        """
+        with open(path, 'wb') as f:
+            pickle.dump((self.stops, self.stop_services), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """
+        load a compiled index
+
+        :param path: index file
+        :type path: str
+
+        :return: BusIndex
+        """
+        with open(path, 'rb') as f:
+            stops, stop_services = pickle.load(f)
+        return cls(stops, stop_services)
+
+    def lookup(self, code):
+        """
+        name and road of a bus stop
+
+        :param code: bus stop code
+        :type code: str
+
+        :return: (description, road name), None if the stop does not exist
+        """
+        return self.stops.get(code)
+
+    def search(self, prefix, limit=5):
+        """
+        bus stops whose name starts with the prefix
+
+        :param prefix: start of the bus stop name, case insensitive
+        :type prefix: str
+
+        :param limit: maximum number of stops to return
+        :type limit: int
+
+        :return: list of bus stop codes
+        """
+        prefix = prefix.lower()
+        res = []
+        for name, code in self._names[bisect_left(self._names, (prefix, '')):]:
+            if not name.startswith(prefix) or len(res) >= limit:
+                break
+            res.append(code)
+        return res
+
+    def services_at(self, code):
+        """
+        bus services calling at a bus stop
+
+        :param code: bus stop code
+        :type code: str
+
+        :return: set of lower case service numbers
+        """
+        return self.stop_services.get(code, frozenset())
+
+
+def load_bus_index(path):
+    """
+    load the compiled index if it was built
+
+    :param path: index file
+    :type path: str
+
+    :return: BusIndex, None if there is no index file
+    """
+    if not path or not os.path.exists(path):
+        logger.info("no bus index at %s, bus stops are not validated", path)
+        return None
+    return BusIndex.load(path)
+
+
+if __name__ == '__main__':
+    # python bus_index.py BusStops.json BusRoutes.json bus_index.pickle
+    index = BusIndex.from_datamall(sys.argv[1], sys.argv[2])
+    index.save(sys.argv[3])
+    print("{} bus stops, {} services".format(len(index.stops), len(index.services)))
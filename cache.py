@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Refresh a value in a background thread on an interval, so a command can
+    answer from the last result instead of doing the slow work itself.
+    """
+
+    def __init__(self, name, func, interval):
+        """
+        :param name: name of the prefetched value, used for the thread name and logs
+        :type name: str
+
+        :param func: function without arguments producing the value
+        :type func: callable
+
+        :param interval: seconds between refreshes
+        :type interval: float
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._value = None
+        self._updated_at = None
+
+    def start(self):
+        """
+        start refreshing in the background, the first refresh runs immediately
+
+        :return: None
+        """
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self):
+        """
+        produce a new value now, the last good value is kept when it fails
+
+        :return: None
+        """
+        start = time.time()
+        try:
+            value = self.func()
+        except Exception:
+            logger.exception("failed to refresh %s", self.name)
+            return
+
+        with self._lock:
+            self._value = value
+            self._updated_at = time.time()
+        logger.info("refreshed %s in %.2fs", self.name, time.time() - start)
+
+    def get(self, max_age):
+        """
+        the last value if it is recent enough
+
+        :param max_age: maximum age of the value in seconds
+        :type max_age: float
+
+        :return: (value, refresh timestamp), None if there is no value or it is too old
+        """
+        with self._lock:
+            if self._updated_at is None or time.time() - self._updated_at > max_age:
+                return None
+            return self._value, self._updated_at
+
+
+class _Flight:
+    """
+    a load in progress that other callers of the same key wait for
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache with a time to live per entry. Concurrent misses
+    for the same key are coalesced, only one caller runs the loader and the
+    others wait for its result. With a stale window, expired values are
+    still served while a background refresh runs, and the last good value
+    is kept when the loader fails.
+    """
+
+    def __init__(self, name, max_size=256):
+        """
+        :param name: cache name, used in logs
+        :type name: str
+
+        :param max_size: maximum number of entries
+        :type max_size: int
+        """
+        self.name = name
+        self.max_size = max_size
+        self._data = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    def get_or_load(self, key, loader, ttl, stale_ttl=0):
+        """
+        return the cached value of a key, loading it when it is missing or expired
+
+        :param key: hashable cache key
+        :type key: tuple
+
+        :param loader: function without arguments producing the value
+        :type loader: callable
+
+        :param ttl: seconds the loaded value stays valid
+        :type ttl: float
+
+        :param stale_ttl: seconds after expiry the value is still served while it is refreshed in the background
+        :type stale_ttl: float
+
+        :return: cached or loaded value
+        """
+        with self._lock:
+            now = time.time()
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self._stats['hits'] += 1
+                return entry[0]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+            if entry is not None and entry[1] + stale_ttl > now:
+                self._stats['stale_hits'] += 1
+                if leader:
+                    threading.Thread(target=self._refresh, args=(key, loader, ttl, flight), daemon=True,
+                                     name='{}-refresh'.format(self.name)).start()
+                return entry[0]
+
+            self._stats['misses' if leader else 'coalesced'] += 1
+
+        if leader:
+            self._load(key, loader, ttl, flight)
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            # serve the last good value when the upstream is down
+            if stale_ttl and entry is not None:
+                return entry[0]
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, loader, ttl, flight):
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+        else:
+            self.set(key, flight.value, ttl)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _refresh(self, key, loader, ttl, flight):
+        self._load(key, loader, ttl, flight)
+        if flight.error is not None:
+            logger.warning("failed to refresh %s %s, keeping the last value: %s", self.name, key, flight.error)
+
+    def set(self, key, value, ttl):
+        """
+        store a value
+
+        :param key: hashable cache key
+        :type key: tuple
+
+        :param value: value to store
+        :type value: object
+
+        :param ttl: seconds the value stays valid
+        :type ttl: float
+
+        :return: None
+        """
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            if len(self._data) > self.max_size:
+                # drop the entry closest to expiry
+                del self._data[min(self._data, key=lambda k: self._data[k][1])]
+
+    def stats(self):
+        """
+        hit, miss and coalesced counters
+
+        :return: stats dictionary
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = (stats['hits'] + stats['stale_hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        return stats
+
+
+class ShortUrlCache:
+    """
+    Remember shortened urls, so the same article is never shortened twice.
+    A small in-memory LRU sits in front of a SQLite table, both are bounded
+    and drop the least recently used urls first.
+    """
+
+    def __init__(self, path, memory_size=512, disk_size=20000):
+        """
+        :param path: SQLite file, ':memory:' for no persistence
+        :type path: str
+
+        :param memory_size: number of urls kept in memory
+        :type memory_size: int
+
+        :param disk_size: number of urls kept on disk
+        :type disk_size: int
+        """
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS short_urls (url TEXT PRIMARY KEY, short_url TEXT NOT NULL, last_used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS short_urls_last_used ON short_urls (last_used)")
+        self._db.commit()
+
+    def _remember(self, url, short_url):
+        self._memory[url] = short_url
+        self._memory.move_to_end(url)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, url):
+        """
+        look up a shortened url
+
+        :param url: original url
+        :type url: str
+
+        :return: shortened url, None if it was never shortened
+        """
+        with self._lock:
+            if url in self._memory:
+                self._memory.move_to_end(url)
+                self._stats['memory_hits'] += 1
+                return self._memory[url]
+
+            row = self._db.execute("SELECT short_url FROM short_urls WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._db.execute("UPDATE short_urls SET last_used = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+            self._remember(url, row[0])
+            self._stats['disk_hits'] += 1
+            return row[0]
+
+    def set(self, url, short_url):
+        """
+        remember a shortened url
+
+        :param url: original url
+        :type url: str
+
+        :param short_url: shortened url
+        :type short_url: str
+
+        :return: None
+        """
+        with self._lock:
+            self._remember(url, short_url)
+            self._db.execute("INSERT OR REPLACE INTO short_urls VALUES (?, ?, ?)", (url, short_url, time.time()))
+
+            excess = self._db.execute("SELECT COUNT(*) FROM short_urls").fetchone()[0] - self.disk_size
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM short_urls WHERE url IN "
+                    "(SELECT url FROM short_urls ORDER BY last_used LIMIT ?)", (excess,))
+            self._db.commit()
+
+    def stats(self):
+        """
+        hit and miss counters
+
+        :return: stats dictionary
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_size'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
@@ -11,19 +11,87 @@ news_api = "news api"
 url_api = 'url shorten api'
 url_workspace = 'url shorten workspace id'
 
+# upstream apis, timeouts in seconds
+http_connect_timeout = 3.05
+http_read_timeout = 10
+http_retries = 2
+http_pool_size = 10
+
+# shortened url cache
+url_cache_path = 'short_urls.sqlite'
+url_cache_memory_size = 512
+url_cache_disk_size = 20000
+
+# bus, seconds arrivals are cached, around the DataMall update interval
+bus_ttl = 20
+# shortcut messages to bus queries, stops are separated by ';'
+bus_presets = {
+    '坐巴士': '63291 53.45.53m',
+    '巴士ncs': '55039',
+}
+# local bus stop index built from DataMall dumps with
+# python bus_index.py BusStops.json BusRoutes.json bus_index.pickle
+# stops are not validated when the file does not exist
+bus_index_path = 'bus_index.pickle'
+
+# weather, seconds cached and seconds after expiry the last weather is still used while refreshing
+weather_ttl = 600
+weather_stale_ttl = 21600
+
 # news
 news_latest = 7
 news_sources = ['bbc-news', 'cnn']
 news_article_cnt = 10
+# 'topic' returns up to news_article_cnt articles per topic, 'overall' up to news_article_cnt in total
+news_cap = 'topic'
+# seconds newsapi responses are cached
+news_headline_ttl = 300
+news_topic_ttl = 900
 
 # jobstreet
 js_username = 'jobstreet username'
 js_password = 'jobstreet password'
 js_url = 'https://myjobstreet.jobstreet.com.sg/home/login.php'
+js_cookie_path = 'jobstreet_cookies.json'
 js_pages = 1
+js_detail_concurrency = 4
+js_detail_timeout = 30
+# send the first js_stream_cnt postings of every keyword to WeChat while the full report is built
+js_stream = True
+js_stream_cnt = 10
 js_email = 'email sender'
 js_email_password = 'email sender password'
 
+# outgoing email, one connection is kept open and reused by the background outbox
+smtp_host = 'smtp.gmail.com'
+smtp_port = 587
+smtp_tls = True
+smtp_batch_size = 10
+smtp_max_retries = 3
+smtp_retry_delay = 5
+smtp_idle_timeout = 60
+
 # platts
 platts_url = "https://www.spglobal.com/platts/en/market-insights/latest-news#"
-platts_pages = 1
\ No newline at end of file
+platts_pages = 1
+platts_commodities = ['commodity2', 'commodity7', 'commodity8']
+platts_seen_path = 'platts_seen.json'
+# refresh platts in the background and answer from the last refresh while it is younger than platts_max_age
+platts_prefetch = False
+platts_prefetch_interval = 600
+platts_max_age = 1800
+# 'http' fetches the listing without a browser and falls back to 'selenium' when it finds nothing,
+# platts_http_url must then serve the listing already filtered by platts_commodities.
+# with 'selenium' every request drives the browser, even when nothing new was published
+platts_engine = 'selenium'
+platts_http_url = platts_url
+
+# dispatcher
+fast_workers = 4
+slow_workers = 1
+max_queue = 10
+
+# browser pool, shared by jobstreet and platts
+driver_pool_size = 1
+driver_max_uses = 20
+driver_max_rss_mb = 1500
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Lane:
+    """
+    A bounded worker pool for one class of commands. Keeps track of how many
+    commands are waiting and how long they waited before a worker picked them up.
+    """
+
+    def __init__(self, name, workers, max_queue):
+        """
+        :param name: lane name, used for thread names and stats
+        :type name: str
+
+        :param workers: number of worker threads
+        :type workers: int
+
+        :param max_queue: maximum number of commands waiting for a worker
+        :type max_queue: int
+        """
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._started = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    def submit(self, func, *args, **kwargs):
+        """
+        queue a command for the lane workers
+
+        :param func: callable to run
+        :type func: callable
+
+        :return: number of commands ahead of this one, or None if the lane is full
+        """
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                return None
+            busy = self._waiting + self._running
+            ahead = busy if busy >= self.workers else 0
+            self._waiting += 1
+
+        self._executor.submit(self._run, time.time(), func, args, kwargs)
+        return ahead
+
+    def _run(self, queued_at, func, args, kwargs):
+        waited = time.time() - queued_at
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+            self._started += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._last_wait = waited
+
+        logger.info("%s lane picked up %s after %.2fs", self.name, getattr(func, '__name__', func), waited)
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("%s lane command failed", self.name)
+            with self._lock:
+                self._failed += 1
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def stats(self):
+        """
+        current queue depth and wait times of the lane
+
+        :return: stats dictionary
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self._waiting,
+                'running': self._running,
+                'started': self._started,
+                'completed': self._completed,
+                'failed': self._failed,
+                # the wait is recorded when a command starts
+                'avg_wait': self._total_wait / self._started if self._started else 0.0,
+                'max_wait': self._max_wait,
+                'last_wait': self._last_wait,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class Dispatcher:
+    """
+    Hand WeChat commands to worker lanes so the message thread never blocks.
+    HTTP-only commands go to the fast lane, browser commands to the slow lane,
+    so a running crawl never delays weather or bus replies.
+    """
+
+    def __init__(self, fast_workers, slow_workers, max_queue):
+        """
+        :param fast_workers: workers for HTTP-only commands (weather, bus, news)
+        :type fast_workers: int
+
+        :param slow_workers: workers for browser commands (jobs, platts)
+        :type slow_workers: int
+
+        :param max_queue: maximum number of waiting commands per lane
+        :type max_queue: int
+        """
+        self.lanes = {
+            'fast': Lane('fast', fast_workers, max_queue),
+            'slow': Lane('slow', slow_workers, max_queue),
+        }
+
+    def dispatch(self, lane, msg, func, *args):
+        """
+        run a reply function on a lane, the returned message (if any) is sent back to the chat
+
+        :param lane: 'fast' or 'slow'
+        :type lane: str
+
+        :param msg: wxpy meassage object
+        :type msg: wxpy meassage object
+
+        :param func: reply function
+        :type func: callable
+
+        :return: acknowledgement text for the chat, or None
+        """
+
+        def task():
+            message = func(*args)
+            if message:
+                msg.reply(message)
+
+        task.__name__ = func.__name__
+        ahead = self.lanes[lane].submit(task)
+
+        if ahead is None:
+            return "现在任务太多了，请稍后再试..."
+        if ahead > 0:
+            return "前面还有{}个任务在处理，已加入队列，请稍候...".format(ahead)
+        return None
+
+    def stats(self):
+        """
+        stats of every lane
+
+        :return: dictionary of lane name to stats dictionary
+        """
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self, wait=True):
+        for lane in self.lanes.values():
+            lane.shutdown(wait=wait)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+from selenium import webdriver
+import atexit
+import logging
+import queue
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def create_driver(path):
+    """
+    Start a new chrome driver
+
+    :param path: driver path
+    :type path: str
+
+    :return: webdriver
+    """
+    chrome_options = webdriver.ChromeOptions()
+
+    # This setting prevent website from sending notifications
+    prefs = {"profile.default_content_setting_values.notifications": 2}
+    chrome_options.add_experimental_option("prefs", prefs)
+
+    return webdriver.Chrome(path, chrome_options=chrome_options)
+
+
+def driver_rss_mb(driver):
+    """
+    Resident memory of the chromedriver process and all the browser processes under it
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :return: rss in MB, None if psutil is not installed
+    """
+    if psutil is None:
+        return None
+
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+    except (psutil.Error, AttributeError):
+        return None
+
+
+class DriverPool:
+    """
+    Keep a number of warm chrome browsers alive and lease them out, so a
+    command does not pay for a cold browser start. Browsers are reset between
+    leases and recycled after a number of uses or when they grow too big.
+    """
+
+    def __init__(self, path, size, max_uses, max_rss_mb=None):
+        """
+        :param path: driver path
+        :type path: str
+
+        :param size: maximum number of browsers alive at the same time
+        :type size: int
+
+        :param max_uses: number of leases after which a browser is recycled
+        :type max_uses: int
+
+        :param max_rss_mb: memory limit after which a browser is recycled, needs psutil
+        :type max_rss_mb: float
+        """
+        self.path = path
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._alive = 0
+        self._uses = {}
+        self._stats = {
+            'leases': 0,
+            'created': 0,
+            'recycled': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+            'last_wait': 0.0,
+        }
+
+        atexit.register(self.close)
+
+    def warm_up(self, count=None):
+        """
+        start browsers ahead of the first lease
+
+        :param count: number of browsers to start, defaults to the pool size
+        :type count: int
+
+        :return: None
+        """
+        for _ in range(count or self.size):
+            with self._lock:
+                if self._alive >= self.size:
+                    return
+                self._alive += 1
+            self._idle.put(self._create())
+
+    def _create(self):
+        try:
+            driver = create_driver(self.path)
+        except Exception:
+            with self._lock:
+                self._alive -= 1
+            raise
+
+        with self._lock:
+            self._uses[id(driver)] = 0
+            self._stats['created'] += 1
+        logger.info("started a new browser, %s alive", self._alive)
+        return driver
+
+    def _acquire(self):
+        # reuse an idle browser first, start a new one while under the limit, otherwise wait.
+        # the wait is polled since a recycled browser frees a slot without going back to the queue
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._alive < self.size
+                if can_create:
+                    self._alive += 1
+
+            if can_create:
+                return self._create()
+
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    @contextmanager
+    def lease(self):
+        """
+        lease a browser for the duration of a with block
+
+        :return: webdriver
+        """
+        start = time.time()
+        driver = self._acquire()
+        waited = time.time() - start
+
+        with self._lock:
+            self._stats['leases'] += 1
+            self._stats['total_wait'] += waited
+            self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+            self._stats['last_wait'] = waited
+        logger.info("browser leased after %.2fs", waited)
+
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+
+    def _release(self, driver):
+        with self._lock:
+            self._uses[id(driver)] += 1
+            uses = self._uses[id(driver)]
+
+        rss = driver_rss_mb(driver)
+        if uses >= self.max_uses:
+            logger.info("recycling browser after %s uses", uses)
+            self._discard(driver)
+        elif self.max_rss_mb and rss is not None and rss > self.max_rss_mb:
+            logger.info("recycling browser using %.0f MB", rss)
+            self._discard(driver)
+        elif not self._reset(driver):
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    @staticmethod
+    def _reset(driver):
+        """
+        clear cookies, storage and extra tabs so the next lease starts clean
+
+        :return: whether the browser is still usable
+        """
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+
+            # storage is not accessible on pages like about:blank
+            driver.execute_script(
+                "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+            try:
+                driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            except Exception:
+                driver.delete_all_cookies()
+            driver.get('about:blank')
+            return True
+        except Exception:
+            logger.exception("failed to reset browser")
+            return False
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            logger.exception("failed to quit browser")
+
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._alive -= 1
+            self._stats['recycled'] += 1
+
+    def stats(self):
+        """
+        lease wait times and browser counts
+
+        :return: stats dictionary
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['alive'] = self._alive
+            stats['idle'] = self._idle.qsize()
+            stats['avg_wait'] = stats['total_wait'] / stats['leases'] if stats['leases'] else 0.0
+        return stats
+
+    def close(self):
+        """
+        quit every idle browser
+
+        :return: None
+        """
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(driver)
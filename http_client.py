@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+import requests, json
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# responses worth another try
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    Shared http client for the upstream apis. Keeps a pool of keep-alive
+    connections per host, applies connect / read timeouts, retries transient
+    failures with jittered backoff and counts latency and errors per host.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, retries=2, backoff=0.5, pool_size=10):
+        """
+        :param connect_timeout: seconds to wait for a connection
+        :type connect_timeout: float
+
+        :param read_timeout: seconds to wait for the response
+        :type read_timeout: float
+
+        :param retries: number of retries after the first attempt
+        :type retries: int
+
+        :param backoff: base seconds between retries, doubled on each retry and jittered
+        :type backoff: float
+
+        :param pool_size: keep-alive connections per host
+        :type pool_size: int
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _session(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def _record(self, host, elapsed, error=False, retry=False):
+        with self._lock:
+            stats = self._stats.setdefault(host, {'requests': 0, 'errors': 0, 'retries': 0,
+                                                  'total_latency': 0.0, 'max_latency': 0.0})
+            stats['requests'] += 1
+            stats['errors'] += int(error)
+            stats['retries'] += int(retry)
+            stats['total_latency'] += elapsed
+            stats['max_latency'] = max(stats['max_latency'], elapsed)
+
+    def request(self, method, url, idempotent=True, **kwargs):
+        """
+        send a request, retrying connection failures and, for idempotent requests,
+        timeouts and transient error responses
+
+        :param method: http method
+        :type method: str
+
+        :param url: request url
+        :type url: str
+
+        :param idempotent: whether the request is safe to send again after it may have reached the server
+        :type idempotent: bool
+
+        :return: requests.Response
+        """
+        host = urlsplit(url).netloc
+        session = self._session(host)
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            start = time.time()
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:
+                retry = not last_attempt and (idempotent or isinstance(e, requests.exceptions.ConnectTimeout))
+                self._record(host, time.time() - start, error=True, retry=retry)
+                if not retry:
+                    raise
+            except requests.Timeout:
+                retry = not last_attempt and idempotent
+                self._record(host, time.time() - start, error=True, retry=retry)
+                if not retry:
+                    raise
+            else:
+                retry = not last_attempt and idempotent and response.status_code in RETRY_STATUS
+                self._record(host, time.time() - start, error=response.status_code >= 400, retry=retry)
+                if not retry:
+                    return response
+
+            # full jitter, so concurrent callers do not retry in lockstep
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            logger.info("retrying %s %s in %.2fs", method, host, delay)
+            time.sleep(delay)
+
+    def get_json(self, url, **kwargs):
+        """
+        send a GET request and decode the json body
+
+        :param url: request url
+        :type url: str
+
+        :return: decoded json
+        """
+        response = self.request('GET', url, **kwargs)
+        response.raise_for_status()
+        return json.loads(response.content)
+
+    def stats(self):
+        """
+        request, error and retry counters and latency per host
+
+        :return: dictionary of host to stats dictionary
+        """
+        with self._lock:
+            return {host: dict(stats, avg_latency=stats['total_latency'] / stats['requests'])
+                    for host, stats in self._stats.items()}
+
+
+# shared by every upstream api, set up by init_http_client
+http_client = HttpClient()
+
+
+def init_http_client(connect_timeout, read_timeout, retries, pool_size):
+    """
+    configure the shared http client
+
+    :param connect_timeout: seconds to wait for a connection
+    :type connect_timeout: float
+
+    :param read_timeout: seconds to wait for the response
+    :type read_timeout: float
+
+    :param retries: number of retries after the first attempt
+    :type retries: int
+
+    :param pool_size: keep-alive connections per host
+    :type pool_size: int
+
+    :return: HttpClient
+    """
+    http_client.connect_timeout = connect_timeout
+    http_client.read_timeout = read_timeout
+    http_client.retries = retries
+    http_client.pool_size = pool_size
+    return http_client
@@ -1,12 +1,43 @@
 # -*- coding: utf-8 -*-
 
-from selenium import webdriver
+from driver_pool import create_driver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import pandas as pd
 import numpy as np
+import json
+import logging
+import os
 import time
+from waits import wait_until, record_wait, staleness_of, elements_present
+
+logger = logging.getLogger(__name__)
+
+# all the displayed job panels on a search result page
+PANEL_XPATH = "//div[not(contains(@style,'display:none'))]/div[@id[starts-with(.,'job_ad_')]]"
+
+# extract the fields of every panel in the browser, in a single round trip
+EXTRACT_PANELS_JS = """
+var panels = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var text = function (el) { return el ? el.innerText.trim() : null; };
+var rows = [];
+for (var i = 0; i < panels.snapshotLength; i++) {
+    var panel = panels.snapshotItem(i);
+    var link = panel.querySelector('.position-title-link');
+    rows.push([
+        text(link),
+        text(panel.querySelector('.company-name')),
+        text(panel.querySelector('#job_desc_detail_' + (i + 1))),
+        text(panel.querySelector('#posted_datetime_' + (i + 1))),
+        link ? link.href : null
+    ]);
+}
+return rows;
+"""
 
 def initialise_driver(url, path):
     """
@@ -22,12 +53,7 @@ def initialise_driver(url, path):
     """
 
     # Initialise the driver
-    chrome_options = webdriver.ChromeOptions()
-
-    # This setting prevent website from sending notifications
-    prefs = {"profile.default_content_setting_values.notifications": 2}
-    chrome_options.add_experimental_option("prefs", prefs)
-    driver = webdriver.Chrome(path, chrome_options=chrome_options)
+    driver = create_driver(path)
 
     # Target URL
     driver.get(url)
@@ -59,10 +85,134 @@ def login(driver, username, password):
         EC.presence_of_element_located((By.NAME, "password"))
     ).send_keys(password)
 
+    current_page = driver.find_element_by_tag_name('html')
     WebDriverWait(driver, 10).until(
         EC.presence_of_element_located((By.ID, "btn_login"))
     ).click()
 
+    # the login form stays on screen until the login request returns, with or without a navigation
+    page_changed = staleness_of(current_page)
+    try:
+        wait_until(driver, lambda d: page_changed(d) or not d.find_elements_by_name("login_id"),
+                   'jobstreet login', 15)
+    except TimeoutException:
+        pass
+
+    return driver
+
+
+def is_logged_in(driver, timeout=10):
+    """
+    Check whether the current page belongs to a logged in session, the search box is
+    only shown after login while the login form is shown otherwise
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param timeout: seconds to wait for either page to render
+    :type timeout: int
+
+    :return: bool
+    """
+    try:
+        wait_until(driver, lambda d: d.find_elements_by_id("search_box_keyword") or d.find_elements_by_name("login_id"),
+                   'jobstreet login state', timeout)
+    except TimeoutException:
+        return False
+
+    return len(driver.find_elements_by_id("search_box_keyword")) > 0
+
+
+def save_session(driver, cookie_path):
+    """
+    Save the cookies of the logged in session
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param cookie_path: file to keep the cookies in
+    :type cookie_path: str
+
+    :return: None
+    """
+    tmp_path = cookie_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(driver.get_cookies(), f)
+    os.replace(tmp_path, cookie_path)
+
+
+def load_session(driver, cookie_path):
+    """
+    Restore saved cookies into the browser, the driver has to be on a jobstreet page already
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param cookie_path: file the cookies were saved in
+    :type cookie_path: str
+
+    :return: whether any cookie was restored
+    """
+    if not os.path.exists(cookie_path):
+        return False
+
+    try:
+        with open(cookie_path) as f:
+            cookies = json.load(f)
+    except ValueError:
+        return False
+
+    restored = 0
+    for cookie in cookies:
+        # some chromedriver versions reject float expiry
+        if 'expiry' in cookie:
+            cookie['expiry'] = int(cookie['expiry'])
+        try:
+            driver.add_cookie(cookie)
+            restored += 1
+        except WebDriverException:
+            # cookie from another jobstreet domain
+            continue
+
+    return restored > 0
+
+
+def ensure_login(driver, url, username, password, cookie_path):
+    """
+    Reuse the saved session if it is still valid, only login again when it is not
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param url: jobstreet login page url
+    :type url: str
+
+    :param username: jobstreet username
+    :type username: str
+
+    :param password: jobstreet password
+    :type password: str
+
+    :param cookie_path: file to keep the session cookies in
+    :type cookie_path: str
+
+    :return: webdriver
+    """
+    driver.get(url)
+
+    if load_session(driver, cookie_path):
+        driver.get(url)
+        if is_logged_in(driver):
+            logger.info("reused saved jobstreet session")
+            return driver
+        logger.info("saved jobstreet session expired, login again")
+
+    driver = login(driver, username, password)
+    if is_logged_in(driver):
+        save_session(driver, cookie_path)
+    else:
+        logger.warning("jobstreet login not detected, the session is not saved and the next request logs in again")
+
     return driver
 
 
@@ -79,14 +229,84 @@ def search_keyword(driver, keyword):
     :return: webdriver
     """
     first_keyword = keyword
+    current_page = driver.find_element_by_tag_name('html')
     driver.find_element_by_id("search_box_keyword").clear()
     driver.find_element_by_id("search_box_keyword").send_keys(first_keyword)
     driver.find_element_by_id("header_searchbox_btn").click()
+    wait_for_page_change(driver, current_page)
+
+    return driver
+
+
+def iter_job_pages(driver, keywords, pages):
+    """
+    Search every keyword and yield the postings of each result page as soon as it is extracted
+
+    :param driver: webdriver, logged in
+    :type driver: webdriver
+
+    :param keywords: job titles / keywords to search
+    :type keywords: list
+
+    :param pages: number of result pages per keyword
+    :type pages: int
+
+    :return: generator of (keyword, dataframe of the postings on the page with a 'keyword' column)
+    """
+    for kwd in keywords:
+        driver = search_keyword(driver, kwd)
+        for _ in range(pages):
+            driver = wait_for_panels(driver)
+            driver, page_info = extract_data(driver)
+            page_info['keyword'] = kwd
+            yield kwd, page_info
+            driver = next_page(driver)
+
+
+def wait_for_page_change(driver, current_page, timeout=15):
+    """
+    Wait for the browser to leave the current page
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param current_page: html element of the page before the navigation
+    :type current_page: WebElement
+
+    :param timeout: seconds to wait
+    :type timeout: int
+
+    :return: webdriver
+    """
+    try:
+        wait_until(driver, staleness_of(current_page), 'jobstreet page change', timeout)
+    except TimeoutException:
+        pass
+
+    return driver
+
+
+def wait_for_panels(driver, timeout=15):
+    """
+    Wait for the job panels of a search result page to render
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param timeout: seconds to wait
+    :type timeout: int
+
+    :return: webdriver
+    """
+    try:
+        wait_until(driver, elements_present(PANEL_XPATH), 'jobstreet job panels', timeout)
+    except TimeoutException:
+        pass
 
     return driver
 
 
-def extract_data(driver):
+def extract_data(driver, bulk=True):
     """
     For each job posted, extract:
         - job title
@@ -99,11 +319,19 @@ def extract_data(driver):
     :param driver: webdriver
     :type driver: webdriver
 
+    :param bulk: extract all panels with a single script call instead of one call per field
+    :type bulk: bool
+
     :return: list of webdriver and data frame
     """
+    if bulk:
+        rows = driver.execute_script(EXTRACT_PANELS_JS, PANEL_XPATH)
+        res_df = pd.DataFrame(rows, columns=['job_title', 'company', 'description', 'recency', 'url'])
+
+        return [driver, res_df]
+
     # Extract all the displayed components + and all the relevant panels on the webpage
-    panels = driver.find_elements_by_xpath(
-        "//div[not(contains(@style,'display:none'))]/div[@id[starts-with(.,'job_ad_')]]")
+    panels = driver.find_elements_by_xpath(PANEL_XPATH)
 
     # Create result dictionary
     res_dict = {
@@ -156,9 +384,57 @@ def extract_data(driver):
 
     return [driver, res_df]
 
-def extract_requirements(driver, url_list):
+def parse_requirements(driver):
+    """
+    Extract job requirements from a loaded job posting page
+
+    :param driver: webdriver on a job posting page
+    :type driver: webdriver
+
+    :return: dictionary of experience, education, salary and location
+    """
+    # get years of experiences
+    try:
+        experience = driver.find_element_by_id("years_of_experience").text
+    except:
+        experience = None
+
+    # get the salary range
+    try:
+        salary_range = driver.find_element_by_id('salary_range').text
+    except:
+        salary_range = None
+
+    # get the location
+    try:
+        location = driver.find_element_by_id('single_work_location').text
+    except:
+        location = None
+
+    # extract the job description
+    jd_txt = driver.find_element_by_id('job_description').text.lower()
+
+    # get education requirement
+    education_lvl = ['bachelor', 'master', 'phd', 'doctor', 'diploma']
+    education_req = ', '.join([i for i in education_lvl if i in jd_txt])
+
+    if education_req == '':
+        education_req = None
+
+    # TODO: Keywords extraction based text analysis and NLP, refine education keywords extraction as well
+
+    return {
+        'experience': experience,
+        'education': education_req,
+        'salary': salary_range,
+        'location': location
+    }
+
+
+def extract_requirements(driver, url_list, concurrency=4, timeout=30):
     """
-    Extract job requirements and keywords from a list of posting urls
+    Extract job requirements and keywords from a list of posting urls. Postings are loaded
+    in several tabs at the same time, a page that fails or times out is left empty
 
     :param driver: webdriver
     :type driver: webdriver
@@ -166,61 +442,141 @@ def extract_requirements(driver, url_list):
     :param url_list: list of job posting urls
     :type url_list: pandas.Series
 
+    :param concurrency: number of tabs loading postings at the same time
+    :type concurrency: int
+
+    :param timeout: seconds to wait for a single posting
+    :type timeout: int
+
     :return: job requirements pandas dataframe
     """
+    urls = list(url_list)
+    empty = {'experience': None, 'education': None, 'salary': None, 'location': None}
+    res_l = [empty] * len(urls)
+
+    # chromedriver waits for a pending navigation before any command in that tab, up to the page load
+    # timeout, so a hanging posting would stall every tab unless the page load timeout is the posting timeout
+    try:
+        page_load_timeout = driver.timeouts.page_load
+    except AttributeError:
+        page_load_timeout = 300
+    driver.set_page_load_timeout(timeout)
+
+    try:
+        # open the extra tabs
+        main_tab = driver.current_window_handle
+        for _ in range(min(concurrency, len(urls)) - 1):
+            driver.execute_script("window.open('about:blank', '_blank');")
+        tabs = driver.window_handles
+
+        pending = deque((idx, url) for idx, url in enumerate(urls) if url)
+        active = {}
+        while pending or active:
+            # start loading the next postings in free tabs, without waiting for the page load
+            for tab in tabs:
+                if tab not in active and pending:
+                    idx, url = pending.popleft()
+                    driver.switch_to.window(tab)
+                    try:
+                        # the flag only lives until the new page replaces the current one
+                        driver.execute_script("window.__loading_job = true; window.location.href = arguments[0];",
+                                              url)
+                    except WebDriverException:
+                        logger.exception("failed to load %s", url)
+                        continue
+                    active[tab] = (idx, time.time())
+
+            # collect the postings that finished loading
+            for tab, (idx, started) in list(active.items()):
+                driver.switch_to.window(tab)
+                try:
+                    ready = driver.execute_script(
+                        "return !window.__loading_job && document.readyState === 'complete' "
+                        "&& document.getElementById('job_description') !== null;")
+                except WebDriverException:
+                    ready = False
+
+                if ready:
+                    record_wait('jobstreet job_description', time.time() - started)
+                    try:
+                        res_l[idx] = parse_requirements(driver)
+                    except WebDriverException:
+                        logger.exception("failed to extract %s", urls[idx])
+                    del active[tab]
+                elif time.time() - started > timeout:
+                    record_wait('jobstreet job_description', time.time() - started, timed_out=True)
+                    del active[tab]
+
+            if active:
+                time.sleep(0.2)
+
+        # close the extra tabs
+        for tab in tabs:
+            if tab != main_tab:
+                driver.switch_to.window(tab)
+                driver.close()
+        driver.switch_to.window(main_tab)
+    finally:
+        driver.set_page_load_timeout(page_load_timeout)
 
-    exp_l = []
-    edu_l = []
-    salary_l = []
-    location_l = []
+    res_df = pd.DataFrame({
+        'url' : urls,
+        'experience' : [i['experience'] for i in res_l],
+        'education' : [i['education'] for i in res_l],
+        'salary': [i['salary'] for i in res_l],
+        'location': [i['location'] for i in res_l]
+    })
 
-    for url in url_list:
-        driver.get(url)
-        time.sleep(5)
-        # get years of experiences
-        try:
-            experience = driver.find_element_by_id("years_of_experience").text
-        except:
-            experience = None
+    return driver, res_df
 
-        # get the salary range
-        try:
-            salary_range = driver.find_element_by_id('salary_range').text
-        except:
-            salary_range = None
+# query parameters that only track the search a posting was found from
+TRACKING_PARAMS = {'fr', 'src', 'ref', 'sectionrank', 'token', 'searchrequesttoken', 'jobsearchid'}
 
-        # get the location
-        try:
-            location = driver.find_element_by_id('single_work_location').text
-        except:
-            location = None
 
-        # extract the job description
-        jd_txt = driver.find_element_by_id('job_description').text.lower()
+def normalize_job_url(url):
+    """
+    Normalize a posting url, so the same posting found by different searches has the same url
 
-        # get education requirement
-        education_lvl = ['bachelor', 'master', 'phd', 'doctor', 'diploma']
-        education_req = ', '.join([i for i in education_lvl if i in jd_txt])
+    :param url: job posting url
+    :type url: str
 
-        if education_req == '':
-            education_req = None
+    :return: normalized url, None if there is no url
+    """
+    # missing urls come back from pandas as None or NaN
+    if not isinstance(url, str) or not url.strip():
+        return None
 
-        # TODO: Keywords extraction based text analysis and NLP, refine education keywords extraction as well
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in TRACKING_PARAMS and not k.lower().startswith('utm_'))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/',
+                       urlencode(query), ''))
 
-        exp_l.append(experience)
-        edu_l.append(education_req)
-        salary_l.append(salary_range)
-        location_l.append(location)
 
-    res_df = pd.DataFrame({
-        'url' : url_list,
-        'experience' : exp_l,
-        'education' : edu_l,
-        'salary': salary_l,
-        'location': location_l
-    })
+def dedup_jobs(res_df):
+    """
+    Keep one row per posting across keywords and pages, and record which keywords found it
+
+    :param res_df: extracted postings with the searched keyword in a 'keyword' column
+    :type res_df: pandas.DataFrame
+
+    :return: dataframe of unique postings with a 'keywords' column
+    """
+    res_df = res_df.copy()
+    res_df['url'] = res_df['url'].map(normalize_job_url)
+
+    # postings without url cannot be told apart, they are all kept
+    has_url = res_df['url'].notna()
+    keywords = res_df[has_url].groupby('url', sort=False)['keyword'].agg(lambda k: ', '.join(dict.fromkeys(k)))
+
+    unique_df = res_df[has_url].drop_duplicates('url').drop(columns='keyword')
+    unique_df['keywords'] = unique_df['url'].map(keywords)
+    no_url_df = res_df[~has_url].rename(columns={'keyword': 'keywords'})
+
+    output_df = pd.concat([unique_df, no_url_df], ignore_index=True)
+    logger.info("%s unique postings out of %s", len(output_df), len(res_df))
+    return output_df
 
-    return driver, res_df
 
 def next_page(driver):
     """
@@ -232,7 +588,9 @@ def next_page(driver):
     :return: webdriver
     """
 
+    current_page = driver.find_element_by_tag_name('html')
     driver.find_element_by_id("page_next").click()
+    wait_for_page_change(driver, current_page)
 
     return driver
 
@@ -258,9 +616,29 @@ def process_jobs_output(final_df):
     output_df['job_title_url'] = '<link href="' + output_df['url'] + '">'+output_df['job_title'] + '</link>'
 
     # reorder the table
-    output_df = output_df[['job_title_url', 'company', 'experience', 'education', 'salary', 'description', 'location']]
+    output_df = output_df[['job_title_url', 'company', 'experience', 'education', 'salary', 'description', 'location',
+                           'keywords']]
 
     # rename the columns
-    output_df.columns = ['Job Title', 'Company', 'Experience', 'Education', 'Salary', 'Description', 'Location']
+    output_df.columns = ['Job Title', 'Company', 'Experience', 'Education', 'Salary', 'Description', 'Location',
+                         'Keywords']
 
-    return output_df
\ No newline at end of file
+    return output_df
+
+
+def summarize_jobs(keyword, jobs_df):
+    """
+    Short listing of postings for a WeChat message
+
+    :param keyword: keyword that found the postings
+    :type keyword: str
+
+    :param jobs_df: postings with job_title, company and url columns
+    :type jobs_df: pandas.DataFrame
+
+    :return: text message
+    """
+    message = "{} 相关工作：\n".format(keyword)
+    for row in jobs_df.itertuples():
+        message += "{} - {}\n{}\n".format(row.job_title, row.company, row.url or '')
+    return message
@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 
 import config
+import logging
+from dispatcher import Dispatcher
+from driver_pool import DriverPool
+from cache import Prefetcher
+from http_client import init_http_client
+from outbox import Outbox
+from waits import wait_stats
 from reply_action import *
 from wxpy import *
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(threadName)s %(name)s: %(message)s')
+
 # api keys
 lta_api = config.lta_api
 weather_api = config.weather_api
@@ -11,27 +20,78 @@ news_api = config.news_api
 url_api = config.url_api
 url_workspace = config.url_workspace
 
+# bus
+bus_ttl = config.bus_ttl
+bus_presets = config.bus_presets
+bus_index = load_bus_index(config.bus_index_path)
+
+# weather
+weather_ttl = config.weather_ttl
+weather_stale_ttl = config.weather_stale_ttl
+
 # news
 news_latest = config.news_latest
 news_sources = config.news_sources
 news_cnt = config.news_article_cnt
+news_cap = config.news_cap
+news_headline_ttl = config.news_headline_ttl
+news_topic_ttl = config.news_topic_ttl
 
 # config for jobstreet
 driver_path = config.driver_path
 js_url = config.js_url
 js_username = config.js_username
 js_password = config.js_password
+js_cookie_path = config.js_cookie_path
 js_pages = config.js_pages
+js_detail_concurrency = config.js_detail_concurrency
+js_detail_timeout = config.js_detail_timeout
+js_stream = config.js_stream
+js_stream_cnt = config.js_stream_cnt
 js_email = config.js_email
 js_email_password = config.js_email_password
 
 # config for platts
 platts_url = config.platts_url
 platts_pages = config.platts_pages
+platts_commodities = config.platts_commodities
+platts_engine = config.platts_engine
+platts_http_url = config.platts_http_url
+platts_seen_path = config.platts_seen_path
+platts_max_age = config.platts_max_age
 
 # wechat user
 wechat_user =config.wechat_user
 
+# pooled connections, timeouts and retries for every upstream api
+http_client = init_http_client(config.http_connect_timeout, config.http_read_timeout, config.http_retries,
+                               config.http_pool_size)
+
+# shortened urls are kept across requests and restarts
+url_cache = init_url_cache(config.url_cache_path, config.url_cache_memory_size, config.url_cache_disk_size)
+
+# worker lanes, so a long crawl never blocks weather / bus replies
+dispatcher = Dispatcher(config.fast_workers, config.slow_workers, config.max_queue)
+
+# warm browsers shared by jobstreet and platts
+driver_pool = DriverPool(driver_path, config.driver_pool_size, config.driver_max_uses, config.driver_max_rss_mb)
+driver_pool.warm_up()
+
+# one reused SMTP connection, emails are sent in the background
+outbox = Outbox(config.smtp_host, config.smtp_port, js_email, js_email_password, config.smtp_tls,
+                config.smtp_batch_size, config.smtp_max_retries, config.smtp_retry_delay, config.smtp_idle_timeout)
+outbox.start()
+
+# keep a ready platts message, so the command answers without a crawl
+platts_prefetcher = None
+if config.platts_prefetch:
+    platts_prefetcher = Prefetcher(
+        'platts-prefetch',
+        lambda: prefetch_platts(driver_pool, platts_url, platts_pages, platts_commodities, platts_engine,
+                                platts_http_url, platts_seen_path, url_api, url_workspace),
+        config.platts_prefetch_interval)
+    platts_prefetcher.start()
+
 # login the bot
 bot = Bot(cache_path=True)
 
@@ -43,31 +103,41 @@ def auto_reply(msg):
     print(msg)
     # check whehter the user ask for weather
     if msg.text == '天气':
-        message = reply_weather(weather_api)
-        return message
+        return dispatcher.dispatch('fast', msg, reply_weather, weather_api, weather_ttl, weather_stale_ttl)
 
     # check whether the user is asking for news by topic
     if msg.text.startswith('新闻 ') or msg.text == '头条':
-        reply_news(msg, news_api, news_latest, news_sources, news_cnt, url_api, url_workspace, msg.sender)
-        return None
+        return dispatcher.dispatch('fast', msg, reply_news, msg, news_api, news_latest, news_sources, news_cnt,
+                                   news_cap, news_headline_ttl, news_topic_ttl, url_api, url_workspace, msg.sender)
 
     # check whether the user is asking for next bus arrival time at any bus stop
-    if msg.text.startswith("巴士 ") or msg.text == '坐巴士' or msg.text == '巴士ncs':
-        message = reply_bus(msg, lta_api)
-        return message
+    if msg.text.startswith("巴士 ") or msg.text in bus_presets:
+        return dispatcher.dispatch('fast', msg, reply_bus, msg, lta_api, bus_ttl, bus_presets, bus_index)
 
     # check whether the use is ask for jobs
     if msg.text.startswith("工作 "):
-        reply_jobs(msg, driver_path, js_url, js_username, js_password, js_pages, js_email, js_email_password, msg.sender)
-        return None
+        return dispatcher.dispatch('slow', msg, reply_jobs, msg, driver_pool, js_url, js_username, js_password,
+                                   js_cookie_path, js_pages, js_detail_concurrency, js_detail_timeout, js_stream,
+                                   js_stream_cnt, js_email, outbox, msg.sender)
 
     # check whether the user is asking for platts headlines
     if msg.text.lower() == 'platts':
-        message = reply_platts(driver_path, platts_url, platts_pages, url_api, url_workspace, msg.sender)
+        message = reply_platts_cached(platts_prefetcher, platts_max_age)
+        if message:
+            return message
+        return dispatcher.dispatch('slow', msg, reply_platts, driver_pool, platts_url, platts_pages,
+                                   platts_commodities, platts_engine, platts_http_url, platts_seen_path, url_api,
+                                   url_workspace, msg.sender)
+
+    # return queue depth and wait time of the worker lanes
+    if msg.text == '状态':
+        message = reply_status(dispatcher.stats(), driver_pool.stats(),
+                               {'天气': weather_cache.stats(), '巴士': bus_cache.stats(), '新闻': news_cache.stats(),
+                                '短链接': url_cache.stats()}, http_client.stats(), outbox.stats(),
+                               wait_stats())
         return message
 
     # return test guide
     if msg.text == '测试指南':
         message = reply_test()
         return message
-
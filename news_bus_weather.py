@@ -1,12 +1,72 @@
 # -*- coding: utf-8 -*-
 
-import requests, json
+from concurrent.futures import ThreadPoolExecutor
+import calendar
+import time
 import pandas as pd
-from newsapi import NewsApiClient
+from cache import TTLCache
+from http_client import http_client
 
-def get_weather(city_name, weather_api):
+# newsapi responses, shared by every news command
+news_cache = TTLCache('news')
+
+# weather per city
+weather_cache = TTLCache('weather')
+
+# bus arrivals per bus stop
+bus_cache = TTLCache('bus')
+
+# number of news topics searched at the same time
+news_workers = 4
+
+
+def request_news(news_api, endpoint, params):
+    """
+    request articles from a News API endpoint
+
+    :param news_api: newsapi
+    :type news_api: str
+
+    :param endpoint: 'everything' or 'top-headlines'
+    :type endpoint: str
+
+    :param params: query parameters
+    :type params: dict
+
+    :return: list of articles
+    """
+
+    return http_client.get_json("https://newsapi.org/v2/{}".format(endpoint),
+                                params=params,
+                                headers={'X-Api-Key': news_api})['articles']
+
+
+def get_weather(city_name, weather_api, ttl=600, stale_ttl=21600):
+    """
+    given a city name and api key for Open Weather Map, return local weather conditions. the result
+    is cached per city, an expired result is still returned while it is refreshed in the background
+
+    :param city_name: name of the city
+    :type city_name: str
+
+    :param weather_api: Open Weather Map API
+    :type weather_api: str
+
+    :param ttl: seconds the weather is cached
+    :type ttl: int
+
+    :param stale_ttl: seconds after expiry the last weather is still returned
+    :type stale_ttl: int
+
+    :return: results dictionary
     """
-    given a city name and api key for Open Weather Map, return local weather conditions
+
+    return weather_cache.get_or_load(city_name.lower(), lambda: fetch_weather(city_name, weather_api), ttl, stale_ttl)
+
+
+def fetch_weather(city_name, weather_api):
+    """
+    request local weather conditions from Open Weather Map
 
     :param city_name: name of the city
     :type city_name: str
@@ -17,15 +77,13 @@ def get_weather(city_name, weather_api):
     :return: results dictionary
     """
 
-    response = requests.get(
+    content = http_client.get_json(
         "https://community-open-weather-map.p.rapidapi.com/weather?mode=json&q={}".format(city_name),
         headers={
             "X-RapidAPI-Host": "community-open-weather-map.p.rapidapi.com",
             "X-RapidAPI-Key": weather_api
         })
 
-    content = json.loads(response.content.decode('utf8').replace("'", '"'))
-
     res_dict = dict()
     res_dict['humidity'] = content['main']['humidity']
     res_dict['temp'] = round((content['main']['temp'] - 273.15), 1)
@@ -36,9 +94,63 @@ def get_weather(city_name, weather_api):
     return res_dict
 
 
-def get_next_bus(lta_api, busstop, bus_list=None):
+class BusArrival:
+    """
+    estimated arrival of the next 3 buses of a bus service, as unix timestamps
+    """
+
+    __slots__ = ('bus_number', 'arrivals')
+
+    def __init__(self, bus_number, arrivals):
+        """
+        :param bus_number: bus service number
+        :type bus_number: str
+
+        :param arrivals: unix timestamps of the next 3 buses, None if unknown
+        :type arrivals: tuple
+        """
+        self.bus_number = bus_number
+        self.arrivals = arrivals
+
+    def intervals(self, now=None):
+        """
+        seconds until each of the next 3 buses arrive, negative if the bus is already due
+
+        :param now: unix timestamp to compare against, defaults to the current time
+        :type now: float
+
+        :return: tuple of seconds, None if unknown
+        """
+        if now is None:
+            now = time.time()
+        return tuple(None if i is None else i - now for i in self.arrivals)
+
+
+def parse_arrival(value):
     """
-    given a bus stop code return estimated arrival time for the next 3 buses of each bus in the bus list
+    parse a DataMall timestamp such as 2019-06-03T10:35:42+08:00
+
+    :param value: ISO 8601 timestamp with offset
+    :type value: str
+
+    :return: unix timestamp, None if it is empty or malformed
+    """
+    if not value:
+        return None
+
+    try:
+        seconds = calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                                   int(value[11:13]), int(value[14:16]), int(value[17:19])))
+        offset = int(value[20:22]) * 3600 + int(value[23:25]) * 60
+    except (ValueError, IndexError):
+        return None
+
+    return seconds - offset if value[19] == '+' else seconds + offset
+
+
+def fetch_bus_arrival(lta_api, busstop):
+    """
+    request bus arrival of a bus stop from LTA DataMall
 
     :param lta_api: LTA DataMall API Key
     :type lta_api: str
@@ -46,60 +158,71 @@ def get_next_bus(lta_api, busstop, bus_list=None):
     :param busstop: bus stop code
     :type busstop: str
 
-    :param bus_list: list of bus to watch, if None, all will be taken
-    :type bus_list: list
-
-    :return: results dataframe
+    :return: list of BusArrival
     """
 
-    response = requests.get(
+    content = http_client.get_json(
         "http://datamall2.mytransport.sg/ltaodataservice/BusArrivalv2?BusStopCode={}".format(busstop),
         headers={'AccountKey': lta_api,
                  'accept': 'application/json'
                  })
-    content = json.loads(response.content.decode('utf8').replace("'", '"'))
 
-    if len(content['Services']) == 0:
-        return pd.DataFrame()
+    return parse_bus_arrival(content)
+
+
+def parse_bus_arrival(content):
+    """
+    build bus arrivals from a DataMall BusArrivalv2 response
+
+    :param content: decoded BusArrivalv2 response
+    :type content: dict
+
+    :return: list of BusArrival
+    """
 
     buses_info = []
     for service in content['Services']:
-        # Extract bus number
-        bus_number = service['ServiceNo']
-        # Extract estimated arrival time for the next bus
-        try:
-            first_arrival = pd.to_datetime(service['NextBus']['EstimatedArrival'], format='%Y-%m-%dT%H:%M:%S+08:00')
-        except:
-            first_arrival = None
-        # Extract estimated arrival time for the second next bus
-        try:
-            second_arrival = pd.to_datetime(service['NextBus2']['EstimatedArrival'], format='%Y-%m-%dT%H:%M:%S+08:00')
-        except:
-            second_arrival = None
-        # Extract estimated arrival time for the third next bus
-        try:
-            third_arrival = pd.to_datetime(service['NextBus3']['EstimatedArrival'], format='%Y-%m-%dT%H:%M:%S+08:00')
-        except:
-            third_arrival = None
-        # Aggregation
-        buses_info.append([bus_number, first_arrival, second_arrival, third_arrival])
-
-    res_df = pd.DataFrame(buses_info, columns=['bus_number', 'first_arrival', 'second_arrival', 'third_arrival'])
+        arrivals = tuple(parse_arrival((service.get(i) or {}).get('EstimatedArrival'))
+                         for i in ('NextBus', 'NextBus2', 'NextBus3'))
+        buses_info.append(BusArrival(service['ServiceNo'], arrivals))
+
+    return buses_info
+
+
+def get_next_bus(lta_api, busstop, bus_list=None, ttl=20):
+    """
+    given a bus stop code return estimated arrival time for the next 3 buses of each bus in the bus list.
+    arrival times are cached shortly and shared by concurrent requests, intervals are computed from
+    the arrival times when replying
+
+    :param lta_api: LTA DataMall API Key
+    :type lta_api: str
+
+    :param busstop: bus stop code
+    :type busstop: str
+
+    :param bus_list: list of bus to watch, if None, all will be taken
+    :type bus_list: list
+
+    :param ttl: seconds arrival times are cached, around the DataMall update interval
+    :type ttl: int
+
+    :return: list of BusArrival
+    """
+
+    buses_info = bus_cache.get_or_load(busstop, lambda: fetch_bus_arrival(lta_api, busstop), ttl)
 
     # only select target buses if its given
     if bus_list:
-        res_df = res_df.loc[res_df['bus_number'].str.lower().isin(bus_list)]
+        buses_info = [i for i in buses_info if i.bus_number.lower() in bus_list]
 
-    res_df['current_time'] = pd.Timestamp.now()
-    res_df['first_interval'] = (res_df['first_arrival'] - res_df['current_time']).dt.seconds
-    res_df['second_interval'] = (res_df['second_arrival'] - res_df['current_time']).dt.seconds
-    res_df['third_interval'] = (res_df['third_arrival'] - res_df['current_time']).dt.seconds
+    return buses_info
 
-    return res_df
-
-def get_news(news_api, topics, latest, sources, article_cnt, kind='news'):
+def get_news(news_api, topics, latest, sources, article_cnt, kind='news', cap='topic', headline_ttl=300,
+             topic_ttl=900):
     """
-    given a topic, extract latest trending news / headlines from sources
+    given a topic, extract latest trending news / headlines from sources. topics are searched
+    at the same time, merged, deduplicated by url and sorted by publish date
 
     :param news_api: newsapi
     :type news_api: str
@@ -119,44 +242,72 @@ def get_news(news_api, topics, latest, sources, article_cnt, kind='news'):
     :param kind: headline or news, if headline is chosen, topic is ignored
     :type kind: str
 
+    :param cap: 'topic' to return up to article_cnt articles per topic, 'overall' for up to article_cnt in total
+    :type cap: str
+
+    :param headline_ttl: seconds headlines are cached
+    :type headline_ttl: int
+
+    :param topic_ttl: seconds topic searches are cached
+    :type topic_ttl: int
+
     :return: results dataframe
     """
 
-    # init
-    client = NewsApiClient(api_key=news_api)
-
     # create filters
     earliest_date = (pd.Timestamp.now() - pd.Timedelta('{}Day'.format(latest))).strftime(format='%Y-%m-%d')
     sources = ",".join(sources)
 
+    def search(topic):
+        key = ('news', ' '.join(topic.lower().split()), sources, latest, article_cnt)
+        return news_cache.get_or_load(key, lambda: request_news(news_api, 'everything', {'q': topic,
+                                                                                         'sources': sources,
+                                                                                         'from': earliest_date,
+                                                                                         'language': 'en',
+                                                                                         'sortBy': 'publishedAt',
+                                                                                         'pageSize': article_cnt}),
+                                      topic_ttl)
+
     # /v2/everythin
     articles_info = []
     if kind == 'news':
         # to extract historical news based on topic
-        for topic in topics:
-            articles = client.get_everything(q=topic,
-                                             sources=sources,
-                                             from_param=earliest_date,
-                                             language='en',
-                                             sort_by='publishedAt',
-                                             page_size=article_cnt)['articles']
-
+        articles = []
+        # the same topic asked twice is searched once
+        topics = list(dict.fromkeys(' '.join(i.lower().split()) for i in topics if i.strip()))
+        if topics:
+            with ThreadPoolExecutor(max_workers=min(len(topics), news_workers)) as executor:
+                for topic_articles in executor.map(search, topics):
+                    articles += topic_articles
 
     else:
         # to extract headlines
-        articles = client.get_top_headlines(sources=sources,
-                                            language='en',
-                                            page_size=article_cnt)['articles']
+        key = ('headline', None, sources, latest, article_cnt)
+        articles = news_cache.get_or_load(key, lambda: request_news(news_api, 'top-headlines', {'sources': sources,
+                                                                                               'language': 'en',
+                                                                                               'pageSize': article_cnt}),
+                                          headline_ttl)
 
+    seen_urls = set()
     for article in articles:
         title = article['title']
         published_at = article['publishedAt']
         description = article['description']
         url = article['url']
 
+        # the same article can match several topics
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+
         articles_info.append([title, description, published_at, url])
 
     res_df = pd.DataFrame(articles_info,
                           columns=['Title', 'Description', 'Publish Date', 'URL'])
 
+    # latest first
+    res_df = res_df.sort_values('Publish Date', ascending=False, kind='mergesort').reset_index(drop=True)
+    if cap == 'overall':
+        res_df = res_df.head(article_cnt)
+
     return res_df
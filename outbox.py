@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import queue
+import smtplib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error):
+    """
+    whether a failed delivery is worth another try, 4xx replies and dropped
+    connections are, 5xx replies and refused recipients are not
+
+    :param error: exception raised while sending
+    :type error: Exception
+
+    :return: bool
+    """
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500 or isinstance(error, smtplib.SMTPConnectError)
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class _Outgoing:
+    """
+    a queued email and its delivery state
+    """
+
+    def __init__(self, message, on_done):
+        self.message = message
+        self.on_done = on_done
+        self.queued_at = time.time()
+        self.attempts = 0
+
+
+class Outbox:
+    """
+    Send emails from a background thread over one authenticated SMTP
+    connection that is kept alive between messages. Queued emails are sent
+    in batches, transient failures are retried and the connection is
+    re-established when the server dropped it.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, batch_size=10, max_retries=3,
+                 retry_delay=5, idle_timeout=60):
+        """
+        :param host: SMTP server
+        :type host: str
+
+        :param port: SMTP port
+        :type port: int
+
+        :param username: login user, None to skip login (e.g. a local test server)
+        :type username: str
+
+        :param password: login password
+        :type password: str
+
+        :param use_tls: whether to STARTTLS before login
+        :type use_tls: bool
+
+        :param batch_size: maximum number of emails sent per batch
+        :type batch_size: int
+
+        :param max_retries: number of retries of a transient failure
+        :type max_retries: int
+
+        :param retry_delay: seconds before retrying a failed email
+        :type retry_delay: float
+
+        :param idle_timeout: seconds of inactivity after which the connection is checked before use
+        :type idle_timeout: float
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+
+        self._queue = queue.Queue()
+        self._smtp = None
+        self._last_used = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'sent': 0, 'failed': 0, 'retries': 0, 'connects': 0, 'total_latency': 0.0,
+                       'max_latency': 0.0}
+
+    def start(self):
+        """
+        start sending in the background
+
+        :return: None
+        """
+        self._thread = threading.Thread(target=self._loop, name='outbox', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, message, on_done=None):
+        """
+        queue an email
+
+        :param message: email to send, with From and To headers
+        :type message: email.message.Message
+
+        :param on_done: called with None once sent, or with the error once given up
+        :type on_done: callable
+
+        :return: number of emails waiting, including this one
+        """
+        self._queue.put(_Outgoing(message, on_done))
+        return self._queue.qsize()
+
+    def _connect(self):
+        self._close()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+        with self._lock:
+            self._stats['connects'] += 1
+        logger.info("connected to %s:%s", self.host, self.port)
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except OSError:
+                pass
+            self._smtp = None
+
+    def _ensure_connection(self):
+        # servers drop idle connections, check it before reusing it
+        if self._smtp is not None and time.time() - self._last_used > self.idle_timeout:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self._close()
+            except OSError:
+                self._smtp = None
+
+        if self._smtp is None:
+            self._connect()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for outgoing in batch:
+                self._deliver(outgoing)
+
+    def _deliver(self, outgoing):
+        outgoing.attempts += 1
+        try:
+            self._ensure_connection()
+            self._smtp.send_message(outgoing.message)
+            self._last_used = time.time()
+        except Exception as e:
+            transient = is_transient(e)
+            if transient:
+                # reconnect for the next attempt
+                self._close()
+
+            if transient and outgoing.attempts <= self.max_retries:
+                logger.warning("failed to send email, retrying in %ss: %s", self.retry_delay, e)
+                with self._lock:
+                    self._stats['retries'] += 1
+                threading.Timer(self.retry_delay, self._queue.put, args=(outgoing,)).start()
+                return
+
+            logger.exception("giving up sending email to %s", outgoing.message['To'])
+            with self._lock:
+                self._stats['failed'] += 1
+            self._done(outgoing, e)
+            return
+
+        latency = time.time() - outgoing.queued_at
+        with self._lock:
+            self._stats['sent'] += 1
+            self._stats['total_latency'] += latency
+            self._stats['max_latency'] = max(self._stats['max_latency'], latency)
+        logger.info("sent email to %s %.2fs after it was queued", outgoing.message['To'], latency)
+        self._done(outgoing, None)
+
+    @staticmethod
+    def _done(outgoing, error):
+        if outgoing.on_done is None:
+            return
+        try:
+            outgoing.on_done(error)
+        except Exception:
+            logger.exception("email callback failed")
+
+    def stats(self):
+        """
+        queue depth, delivery counters and latency from queueing to sending
+
+        :return: stats dictionary
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_latency'] = stats['total_latency'] / stats['sent'] if stats['sent'] else 0.0
+        return stats
@@ -1,7 +1,50 @@
 # -*- coding: utf-8 -*-
 
-from selenium import webdriver
+from driver_pool import create_driver
+from selenium.common.exceptions import TimeoutException
+from waits import wait_until, staleness_of
+from http_client import http_client
 import pandas as pd
+import requests
+import json
+import logging
+import os
+import threading
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+# every news item in the feed
+NEWS_XPATH = "//div[@class='newsId']"
+
+# walk every news item once in the browser and return title, topic, date and url together
+EXTRACT_NEWS_JS = """
+var items = document.querySelectorAll('div[class="newsId"]');
+var text = function (el) { return el ? el.innerText.trim() : null; };
+var rows = [];
+for (var i = 0; i < items.length; i++) {
+    var link = items[i].querySelector(':scope > a');
+    if (!link) { continue; }
+    var feed = link.getAttribute('data-gtm-category') === 'News Feed';
+    rows.push([
+        text(link.querySelector(':scope > div > h2')),
+        feed ? text(link.querySelector(':scope > div > ul > li[class="meta-data__type"]')) : null,
+        feed ? text(link.querySelector(':scope > div > ul > li[class="meta-data__date"]')) : null,
+        link.href
+    ]);
+}
+return rows;
+"""
+
+# url of the first news item in the feed
+FIRST_NEWS_URL_JS = """
+var link = document.querySelector('div[class="newsId"] > a');
+return link ? link.href : null;
+"""
 
 def initialise_platts_driver(url, path):
     """
@@ -17,33 +60,78 @@ def initialise_platts_driver(url, path):
     """
 
     # Initialise the driver
-    chrome_options = webdriver.ChromeOptions()
-
-    # This setting prevent website from sending notifications
-    prefs = {"profile.default_content_setting_values.notifications": 2}
-    chrome_options.add_experimental_option("prefs", prefs)
-    driver = webdriver.Chrome(path, chrome_options=chrome_options)
+    driver = create_driver(path)
 
     # Target URL
     driver.get(url)
 
     return driver
 
-def click_options(driver):
+def click_options(driver, commodities=('commodity2', 'commodity7', 'commodity8')):
     """
     choose topics for platts news based on user input
 
     :param driver: webdriver
     :type driver: webdriver
 
-    :return: webdriver
+    :param commodities: ids of the commodity filters to tick
+    :type commodities: list
+
+    :return: webdriver, whether every filter was seen applied to the feed
     """
 
-    driver.find_element_by_xpath('//label[@for="commodity2"]').click()
-    driver.find_element_by_xpath('//label[@for="commodity7"]').click()
-    driver.find_element_by_xpath('//label[@for="commodity8"]').click()
+    filtered = True
+    for commodity in commodities:
+        items = driver.find_elements_by_xpath(NEWS_XPATH)
+        first_url = driver.execute_script(FIRST_NEWS_URL_JS)
+        driver.find_element_by_xpath('//label[@for="{}"]'.format(commodity)).click()
+        # every filter re-renders the feed, reading it before then returns the previous listing
+        filtered = wait_for_filter(driver, commodity, items[0] if items else None, first_url, len(items)) \
+            and filtered
 
-    return driver
+    return driver, filtered
+
+def wait_for_filter(driver, commodity, first_item, first_url, news_cnt, timeout=5):
+    """
+    Wait until a ticked filter is checked and the feed was re-rendered. A feed that already
+    matched the filter may not change visibly, so a timeout only means it cannot be told
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param commodity: id of the ticked commodity filter
+    :type commodity: str
+
+    :param first_item: first news item before the filter was ticked, None if the feed was empty
+    :type first_item: WebElement
+
+    :param first_url: url of the first news item before the filter was ticked
+    :type first_url: str
+
+    :param news_cnt: number of news items before the filter was ticked
+    :type news_cnt: int
+
+    :param timeout: seconds to wait for each of the checkbox and the feed
+    :type timeout: int
+
+    :return: whether the filter was seen applied
+    """
+
+    def refreshed(d):
+        if first_item is not None and staleness_of(first_item)(d):
+            return True
+        url = d.execute_script(FIRST_NEWS_URL_JS)
+        return url is not None and (url != first_url or count_news(d) != news_cnt)
+
+    try:
+        wait_until(driver, lambda d: d.find_element_by_id(commodity).is_selected(), 'platts filter checkbox',
+                   timeout)
+        wait_until(driver, refreshed, 'platts filter', timeout)
+    except TimeoutException:
+        logger.warning("could not tell whether the platts feed was filtered by %s", commodity)
+        return False
+
+    return True
 
 def extract_news(driver):
     """
@@ -59,17 +147,8 @@ def extract_news(driver):
     :return: driver, pandas Dataframe
     """
 
-    news_topic = [i.text for i in driver.find_elements_by_xpath("//div[@class='newsId']/a[@data-gtm-category='News Feed']/div/ul/li[@class='meta-data__type']")]
-    news_date = [i.text for i in driver.find_elements_by_xpath("//div[@class='newsId']/a[@data-gtm-category='News Feed']/div/ul/li[@class='meta-data__date']")]
-    news_title = [i.text for i in driver.find_elements_by_xpath("//div[@class='newsId']/a/div/h2")]
-    news_url = [i.get_attribute('href') for i in driver.find_elements_by_xpath("//div[@class='newsId']/a")]
-
-    res_df = pd.DataFrame({
-        'title': news_title,
-        'topic': news_topic,
-        'date': news_date,
-        'url': news_url
-    })
+    rows = driver.execute_script(EXTRACT_NEWS_JS)
+    res_df = pd.DataFrame(rows, columns=['title', 'topic', 'date', 'url'])
 
     return driver, res_df
 
@@ -83,7 +162,44 @@ def load_more_page(driver):
     :return: webdriver
     """
 
+    news_cnt = count_news(driver)
     driver.find_element_by_id("loadMoreNews").click()
+    wait_for_news(driver, news_cnt)
+
+    return driver
+
+def count_news(driver):
+    """
+    Count news items currently in the feed
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :return: number of news items
+    """
+
+    return len(driver.find_elements_by_xpath(NEWS_XPATH))
+
+def wait_for_news(driver, news_cnt=0, timeout=15):
+    """
+    Wait until the feed shows more than news_cnt news items
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param news_cnt: number of news items before loading more
+    :type news_cnt: int
+
+    :param timeout: seconds to wait
+    :type timeout: int
+
+    :return: webdriver
+    """
+
+    try:
+        wait_until(driver, lambda d: count_news(d) > news_cnt, 'platts news feed', timeout)
+    except TimeoutException:
+        pass
 
     return driver
 
@@ -107,4 +223,166 @@ def scroll_down(driver):
     return driver
 
 
+def crawl_news(driver, url, pages, commodities, seen_urls=()):
+    """
+    crawl the filtered news feed, loading more pages only until an already seen article shows up
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param url: platts url
+    :type url: str
+
+    :param pages: maximum number of times to load more news
+    :type pages: int
+
+    :param commodities: ids of the commodity filters to tick
+    :type commodities: list
+
+    :param seen_urls: urls of articles returned before
+    :type seen_urls: set
+
+    :return: driver, pandas Dataframe, whether the feed was seen filtered
+    """
+
+    driver.get(url)
+    driver = wait_for_news(driver)
+    driver, filtered = click_options(driver, commodities)
+    driver, res_df = extract_news(driver)
+
+    for _ in range(pages):
+        # a seen article in a listing that may not be filtered proves nothing
+        if filtered and res_df['url'].isin(seen_urls).any():
+            break
+        driver = load_more_page(driver)
+        driver = scroll_down(driver)
+        driver, res_df = extract_news(driver)
+
+    return driver, res_df, filtered
+
+_seen_lock = threading.Lock()
+
+def load_seen(path, key):
+    """
+    load the articles seen before for a commodity filter
+
+    :param path: file keeping the seen articles
+    :type path: str
+
+    :param key: commodity filter key
+    :type key: str
+
+    :return: set of seen urls, pandas Dataframe of the last listing
+    """
+
+    with _seen_lock:
+        state = _read_seen(path)
+
+    feed = state.get(key, {'urls': [], 'latest': []})
+    return set(feed['urls']), pd.DataFrame(feed['latest'], columns=['title', 'topic', 'date', 'url'])
+
+def update_seen(path, key, res_df, max_urls=1000):
+    """
+    remember the articles of the latest listing for a commodity filter
+
+    :param path: file keeping the seen articles
+    :type path: str
+
+    :param key: commodity filter key
+    :type key: str
+
+    :param res_df: latest listing
+    :type res_df: pandas.DataFrame
+
+    :param max_urls: maximum number of urls to remember per filter
+    :type max_urls: int
+
+    :return: None
+    """
+
+    with _seen_lock:
+        state = _read_seen(path)
+        feed = state.get(key, {'urls': [], 'latest': []})
+
+        # newest first, so the oldest urls are dropped once the limit is reached
+        urls = [i for i in res_df['url'] if i]
+        urls += [i for i in feed['urls'] if i not in set(urls)]
+        state[key] = {
+            'urls': urls[:max_urls],
+            'latest': res_df[['title', 'topic', 'date', 'url']].astype(object).where(res_df.notnull(), None)
+                .to_dict('records')
+        }
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+def _read_seen(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+def parse_news_html(html, base_url=None):
+    """
+    parse news from the html of the platts news listing, same result as extract_news
+
+    :param html: html of the news listing
+    :type html: str or bytes
+
+    :param base_url: url the html was fetched from, to resolve relative links
+    :type base_url: str
+
+    :return: pandas Dataframe
+    """
+
+    if lxml is None:
+        raise ImportError("lxml is required to parse platts news without a browser")
+
+    def text(elements):
+        return ' '.join(elements[0].text_content().split()) if elements else None
+
+    doc = lxml.html.fromstring(html, base_url=base_url)
+    if base_url:
+        doc.make_links_absolute(base_url)
+
+    rows = []
+    for item in doc.xpath("//div[@class='newsId']"):
+        links = item.xpath("./a")
+        if not links:
+            continue
+        link = links[0]
+        feed = link.get('data-gtm-category') == 'News Feed'
+        rows.append([
+            text(link.xpath("./div/h2")),
+            text(link.xpath("./div/ul/li[@class='meta-data__type']")) if feed else None,
+            text(link.xpath("./div/ul/li[@class='meta-data__date']")) if feed else None,
+            link.get('href')
+        ])
+
+    return pd.DataFrame(rows, columns=['title', 'topic', 'date', 'url'])
+
+def fetch_news_http(url, timeout=10):
+    """
+    fetch and parse the platts news listing with plain http, without a browser
+
+    :param url: url of the news listing or the feed behind it
+    :type url: str
+
+    :param timeout: request timeout in seconds
+    :type timeout: int
+
+    :return: pandas Dataframe, None if the listing could not be fetched or parsed
+    """
 
+    try:
+        response = http_client.request('GET', url, timeout=timeout, headers={'User-Agent': 'Mozilla/5.0'})
+        response.raise_for_status()
+        return parse_news_html(response.content, base_url=response.url)
+    except (requests.RequestException, ImportError, ValueError):
+        logger.exception("failed to fetch platts news over http")
+        return None
@@ -4,11 +4,24 @@ from news_bus_weather import *
 from jobstreet import *
 from utils import *
 from platts import *
-import os
+from bus_index import load_bus_index
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import time
 
+logger = logging.getLogger(__name__)
 
-def reply_weather(weather_api, city='Singapore'):
+# most bus stops answered in one message, every stop costs a DataMall call
+max_bus_stops = 10
+
+# number of bus stops fetched at the same time
+bus_workers = 8
+
+# most news topics searched for one message, every topic costs NewsAPI quota
+max_news_topics = 5
+
+
+def reply_weather(weather_api, weather_ttl, weather_stale_ttl, city='Singapore'):
     """
     generate weather meassgae
 
@@ -18,16 +31,23 @@ def reply_weather(weather_api, city='Singapore'):
     :param weather_api: Open Weather API key
     :type weather_api: str
 
+    :param weather_ttl: seconds the weather is cached
+    :type weather_ttl: int
+
+    :param weather_stale_ttl: seconds after expiry the last weather is still used
+    :type weather_stale_ttl: int
+
     :return: text message
     """
-    weather_df = get_weather(city, weather_api)
+    weather_df = get_weather(city, weather_api, weather_ttl, weather_stale_ttl)
     message = """今天的天气是这样的:\n湿度: {}\n温度: {}摄氏度 (最低. {}, 最高. {})\n预计天气为: {}""".format(
         weather_df['humidity'], weather_df['temp'], weather_df['temp_min'], weather_df['temp_max'],
         weather_df['weather'])
     return message
 
 
-def reply_news(msg, news_api, news_latest, news_sources, news_cnt, url_api, url_workspace, user):
+def reply_news(msg, news_api, news_latest, news_sources, news_cnt, news_cap, news_headline_ttl, news_topic_ttl,
+               url_api, url_workspace, user):
     """
     generate news pdf and reply to the user
 
@@ -46,6 +66,15 @@ def reply_news(msg, news_api, news_latest, news_sources, news_cnt, url_api, url_
     :param news_cnt: number of news to extract
     :type news_cnt: int
 
+    :param news_cap: 'topic' to cap news_cnt per topic, 'overall' to cap it in total
+    :type news_cap: str
+
+    :param news_headline_ttl: seconds headlines are cached
+    :type news_headline_ttl: int
+
+    :param news_topic_ttl: seconds topic searches are cached
+    :type news_topic_ttl: int
+
     :param url_api: url shorten api
     :type url_api: str
 
@@ -59,9 +88,14 @@ def reply_news(msg, news_api, news_latest, news_sources, news_cnt, url_api, url_
     """
     if msg.text.startswith('新闻 '):
         topics = msg.text[3:].split(', ')
-        news_df = get_news(news_api, topics, news_latest, news_sources, news_cnt)
+        if len(set(' '.join(i.lower().split()) for i in topics)) > max_news_topics:
+            user.send("一次最多搜索 {} 个主题".format(max_news_topics))
+            return
+        news_df = get_news(news_api, topics, news_latest, news_sources, news_cnt, cap=news_cap,
+                           headline_ttl=news_headline_ttl, topic_ttl=news_topic_ttl)
     else:
-        news_df = get_news(news_api, [], news_latest, news_sources, news_cnt, kind='headline')
+        news_df = get_news(news_api, [], news_latest, news_sources, news_cnt, kind='headline',
+                           headline_ttl=news_headline_ttl, topic_ttl=news_topic_ttl)
 
     # create news pdf
     news_file = '{}_{}'.format(msg.text, user.name)
@@ -87,9 +121,90 @@ def reply_news(msg, news_api, news_latest, news_sources, news_cnt, url_api, url_
     return
 
 
-def reply_bus(msg, lta_api):
+def parse_bus_query(query, bus_index=None):
+    """
+    parse bus stops and bus lists, stops are separated by ';'
+    e.g. '63291 53.45; 55039'. with a bus index, a stop can also be given by the start of its name
+    e.g. 'opp blk 123 53.45'
+
+    :param query: bus query
+    :type query: str
+
+    :param bus_index: local bus stop index
+    :type bus_index: bus_index.BusIndex
+
+    :return: list of (bus stop code or name, bus list or None)
+    """
+    stops = []
+    for stop in query.lower().split(';'):
+        # extract bus stop number and potentially, bus lists
+        stop = stop.replace(',', ' ').split()
+        if len(stop) == 0:
+            continue
+
+        if bus_index is None or stop[0].isdigit():
+            stops.append((stop[0], stop[1].split('.') if len(stop) > 1 else None))
+        elif len(stop) > 1 and not bus_index.search(' '.join(stop)) and \
+                _calls_at_any(bus_index, bus_index.search(' '.join(stop[:-1])), stop[-1].split('.')):
+            # a trailing number is a bus list only when those buses call at the named stop, e.g. not 'blk 10'
+            stops.append((' '.join(stop[:-1]), stop[-1].split('.')))
+        else:
+            stops.append((' '.join(stop), None))
+
+    return stops
+
+
+def _calls_at_any(bus_index, codes, bus_list):
+    return any(all(i in bus_index.services_at(code) for i in bus_list) for code in codes)
+
+
+def resolve_bus_stop(busstop, bus_list, bus_index):
+    """
+    check a bus stop and its bus list against the local bus index
+
+    :param busstop: bus stop code or start of its name
+    :type busstop: str
+
+    :param bus_list: list of bus to watch, None for all
+    :type bus_list: list
+
+    :param bus_index: local bus stop index
+    :type bus_index: bus_index.BusIndex
+
+    :return: bus stop code, bus list, title of the stop, error message (None if the stop is valid) and
+             note on buses left out of the bus list (None if there is none)
+    """
+    if bus_index is None:
+        return busstop, bus_list, busstop, None, None
+
+    if busstop.isdigit():
+        if bus_index.lookup(busstop) is None:
+            return busstop, bus_list, busstop, "没有这个巴士站: {}".format(busstop), None
+    else:
+        codes = bus_index.search(busstop)
+        if len(codes) == 0:
+            return busstop, bus_list, busstop, "没有找到巴士站: {}".format(busstop), None
+        if len(codes) > 1:
+            options = '\n'.join("{} {}".format(i, bus_index.lookup(i)[0]) for i in codes)
+            return busstop, bus_list, busstop, "请用号码选择巴士站:\n{}".format(options), None
+        busstop = codes[0]
+
+    title = "{} {}".format(busstop, bus_index.lookup(busstop)[0])
+
+    if bus_list:
+        unknown = [i for i in bus_list if i not in bus_index.services_at(busstop)]
+        message = "这个巴士站没有 {} 号巴士".format(', '.join(unknown))
+        if len(unknown) == len(bus_list):
+            return busstop, bus_list, title, message, None
+        if unknown:
+            return busstop, [i for i in bus_list if i not in unknown], title, None, message
+
+    return busstop, bus_list, title, None, None
+
+
+def reply_bus(msg, lta_api, bus_ttl, bus_presets, bus_index=None):
     """
-    reply next 3 buses waiting time
+    reply next 3 buses waiting time, for one or more bus stops
 
     :param msg: wxpy meassage object
     :type msg: wxpy meassage object
@@ -97,47 +212,112 @@ def reply_bus(msg, lta_api):
     :param lta_api: LTA DataMall API Key
     :type lta_api: str
 
+    :param bus_ttl: seconds bus arrivals are cached
+    :type bus_ttl: int
+
+    :param bus_presets: shortcut message to bus query, e.g. {'巴士ncs': '55039'}
+    :type bus_presets: dict
+
+    :param bus_index: local bus stop index to resolve names and reject unknown stops, None to skip
+    :type bus_index: bus_index.BusIndex
+
     :return: text message
     """
-    # short cut for qiaoling and NCS
-    if msg.text == '坐巴士':
-        msg = ['63291', '53.45.53m']
-    elif msg.text == '巴士ncs':
-        msg = ['55039']
+    # short cut such as qiaoling and NCS
+    if msg.text in bus_presets:
+        stops = parse_bus_query(bus_presets[msg.text], bus_index)
     else:
-        # extract bus stop number and potentially, bus lists
-        msg = msg.text.lower()[3:].split(" ")
+        stops = parse_bus_query(msg.text[3:], bus_index)
 
-    busstop = msg[0]
-    if len(msg) == 1:
-        bus_list = None
-    else:
-        bus_list = msg[1].split('.')
+    if len(stops) == 0:
+        return "请告诉我巴士站号码，例：巴士 63291 53.45"
 
-    bus_df = get_next_bus(lta_api, busstop, bus_list)
+    # the same stop asked twice is answered once
+    stops = list(dict.fromkeys((busstop, tuple(bus_list) if bus_list else None) for busstop, bus_list in stops))
+    if len(stops) > max_bus_stops:
+        return "一次最多查询 {} 个巴士站".format(max_bus_stops)
 
-    if len(bus_df) == 0:
-        return "目前好像已经没有巴士了呢...或者出问题了！"
-    else:
-        message = ""
-        for i in bus_df[['bus_number', 'first_interval', 'second_interval', 'third_interval']].iterrows():
-            bus_record = list(i[1])
-            bus_record = [bus_record[0]] + [86400 - i if i > 80000 else i for i in bus_record[1:]]
-            message += "巴士: {}\n下一班 {} 分钟\n下下一班 {} 分钟\n下下下一班 {} 分钟\n========\n". \
-                format(bus_record[0], round(bus_record[1] / 60, 1), round(bus_record[2] / 60, 1),
-                       round(bus_record[3] / 60, 1))
-        return message
+    stops = [resolve_bus_stop(busstop, list(bus_list) if bus_list else None, bus_index)
+             for busstop, bus_list in stops]
+
+    # valid stops are fetched at the same time, arrivals of the same stop are fetched once by the cache
+    with ThreadPoolExecutor(max_workers=min(len(stops), bus_workers)) as executor:
+        futures = [None if error else executor.submit(get_next_bus, lta_api, busstop, bus_list, bus_ttl)
+                   for busstop, bus_list, _, error, _ in stops]
+
+    now = time.time()
+    message = ""
+    for (busstop, _, title, error, note), future in zip(stops, futures):
+        if len(stops) > 1 or bus_index is not None:
+            message += "车站: {}\n".format(title)
+        if note:
+            message += note + "\n"
+
+        if error:
+            message += error + "\n========\n"
+            continue
+
+        try:
+            buses_info = future.result()
+        except Exception:
+            logger.exception("failed to get bus arrival of %s", busstop)
+            buses_info = []
+
+        if len(buses_info) == 0:
+            message += "目前好像已经没有巴士了呢...或者出问题了！\n========\n"
+            continue
+
+        message += format_buses(buses_info, now)
+
+    return message
+
+
+def format_buses(buses_info, now):
+    """
+    format the next 3 buses of each bus service
+
+    :param buses_info: bus arrivals of a bus stop
+    :type buses_info: list
+
+    :param now: unix timestamp the intervals are computed against
+    :type now: float
+
+    :return: text
+    """
+    message = ""
+    for bus in buses_info:
+        intervals = [format_interval(i) for i in bus.intervals(now)]
+        message += "巴士: {}\n下一班 {}\n下下一班 {}\n下下下一班 {}\n========\n". \
+            format(bus.bus_number, intervals[0], intervals[1], intervals[2])
+    return message
+
+
+def format_interval(seconds):
+    """
+    format seconds until a bus arrives
+
+    :param seconds: seconds until arrival, negative if the bus is already due
+    :type seconds: float
+
+    :return: text
+    """
+    if seconds is None:
+        return "暂无信息"
+    if seconds <= 0:
+        return "已到站"
+    return "{} 分钟".format(round(seconds / 60, 1))
 
 
-def reply_jobs(msg, driver_path, js_url, js_username, js_password, js_pages, sender_email, sender_password, user):
+def reply_jobs(msg, driver_pool, js_url, js_username, js_password, js_cookie_path, js_pages, js_detail_concurrency,
+               js_detail_timeout, js_stream, js_stream_cnt, sender_email, outbox, user):
     """
     generate jobs pdf and send to user email
 
     :param msg: wxpy meassage object
     :type msg: wxpy meassage object
 
-    :param driver_path: chrome driver path
-    :type driver_path: str
+    :param driver_pool: pool of warm chrome drivers
+    :type driver_pool: driver_pool.DriverPool
 
     :param js_url: JobStreet login page url
     :type js_url: str
@@ -148,14 +328,29 @@ def reply_jobs(msg, driver_path, js_url, js_username, js_password, js_pages, sen
     :param js_password: JobStreet password
     :type js_password: str
 
+    :param js_cookie_path: file to keep the JobStreet session cookies in
+    :type js_cookie_path: str
+
     :param js_pages: number of pages of job postings to extract
     :type js_pages: int
 
+    :param js_detail_concurrency: number of job postings loaded at the same time
+    :type js_detail_concurrency: int
+
+    :param js_detail_timeout: seconds to wait for a single job posting
+    :type js_detail_timeout: int
+
+    :param js_stream: whether to send the first postings of every keyword while the crawl continues
+    :type js_stream: bool
+
+    :param js_stream_cnt: number of postings sent per keyword when streaming
+    :type js_stream_cnt: int
+
     :param sender_email: sender's email
     :type sender_email: str
 
-    :param sender_password: sender's password
-    :type sender_password: str
+    :param outbox: background email sender
+    :type outbox: outbox.Outbox
 
     :param user: WeChat user to reply to
     :type user: wxpy user
@@ -166,49 +361,140 @@ def reply_jobs(msg, driver_path, js_url, js_username, js_password, js_pages, sen
 
     email = msg.text.split('^')[-1]
     keywords = msg.text.split('^')[0][3:].strip().split(', ')
-    driver = initialise_driver(js_url, driver_path)
-    driver = login(driver, js_username, js_password)
-
-    res_l = []
-    for kwd in keywords:
-        driver = search_keyword(driver, kwd)
-        for _ in range(js_pages):
-            time.sleep(2)
-            driver, page_info = extract_data(driver)
+
+    with driver_pool.lease() as driver:
+        driver = ensure_login(driver, js_url, js_username, js_password, js_cookie_path)
+
+        res_l = []
+        streamed_urls = set()
+        streamed_cnt = {}
+        for kwd, page_info in iter_job_pages(driver, keywords, js_pages):
             res_l.append(page_info)
-            driver = next_page(driver)
-    res_df = pd.concat(res_l)
-    driver, app_df = extract_requirements(driver, res_df['url'])
 
-    driver.quit()
+            # send the first postings right away, the detail crawl and the pdf take minutes
+            remaining = js_stream_cnt - streamed_cnt.get(kwd, 0)
+            if js_stream and remaining > 0:
+                page_df = dedup_jobs(page_info).dropna(subset=['url'])
+                page_df = page_df[~page_df['url'].isin(streamed_urls)].head(remaining)
+                if len(page_df):
+                    streamed_urls.update(page_df['url'])
+                    streamed_cnt[kwd] = streamed_cnt.get(kwd, 0) + len(page_df)
+                    user.send(summarize_jobs(kwd, page_df))
+
+        # overlapping keywords find the same postings, visit each of them once
+        res_df = dedup_jobs(pd.concat(res_l))
+        if js_stream:
+            user.send('共找到{}个工作，正在生成完整的工作信息...'.format(len(res_df)))
+        driver, app_df = extract_requirements(driver, res_df['url'].dropna(), js_detail_concurrency, js_detail_timeout)
 
     res_df = res_df.merge(app_df, on='url', how='left')
     res_df = process_jobs_output(res_df)
-    file_name = '{}_{}'.format(msg.text, user.name)
-    create_pdf(res_df, file_name)
-
+    # the pdf stays in memory, concurrent requests never share a file
+    subject = '{}_{}'.format(msg.text, user.name)
+    pdf = create_pdf(res_df)
 
     body = 'To be updated'
 
-    send_email(sender_email, sender_password, email, file_name, body, file_name+'.pdf')
-    user.send('工作信息已经被发送至{}, 请查收'.format(email))
-    os.remove(file_name+'.pdf')
+    def on_done(error):
+        if error is not None:
+            user.send('工作信息发送至{}失败，请稍后再试'.format(email))
+
+    message = build_email(sender_email, email, subject, body, pdf, safe_file_name(keywords[0] + '_jobs', 'pdf'))
+    outbox.enqueue(message, on_done)
+    user.send('工作信息已加入发送队列，将发送至{}, 请查收'.format(email))
     return
 
 
-def reply_platts(driver_path, platts_url, platts_pages, url_api, url_workspace, user):
+def fetch_platts(driver_pool, platts_url, platts_pages, platts_commodities, platts_engine, platts_http_url,
+                 platts_seen_path):
     """
-    generate platts meassgae
+    crawl platts incrementally and remember the articles seen
 
-    :param driver_path: webdriver path
-    :type driver_path: str
+    :param driver_pool: pool of warm chrome drivers
+    :type driver_pool: driver_pool.DriverPool
 
     :param platts_url: platts url
     :type platts_url: str
 
-    :param platts_pages: pages to load
+    :param platts_pages: maximum pages to load
     :type platts_pages: int
 
+    :param platts_commodities: ids of the commodity filters to tick
+    :type platts_commodities: list
+
+    :param platts_engine: 'http' to fetch the listing without a browser, 'selenium' to crawl it
+    :type platts_engine: str
+
+    :param platts_http_url: url fetched by the http engine
+    :type platts_http_url: str
+
+    :param platts_seen_path: file keeping the articles seen before
+    :type platts_seen_path: str
+
+    :return: dataframe of articles not seen before, dataframe of the latest listing
+    """
+    feed_key = ','.join(sorted(platts_commodities))
+    seen_urls, latest_df = load_seen(platts_seen_path, feed_key)
+    res_df = None
+    filtered = True
+
+    # platts_http_url has to serve the filtered listing, the seen urls only hold filtered articles
+    if platts_engine == 'http':
+        res_df = fetch_news_http(platts_http_url)
+
+    # selenium is the fallback when the http engine is off or finds nothing
+    if platts_engine != 'http' or res_df is None or len(res_df) == 0:
+        with driver_pool.lease() as driver:
+            driver, res_df, filtered = crawl_news(driver, platts_url, platts_pages, platts_commodities, seen_urls)
+
+    new_df = res_df.loc[~res_df['url'].isin(seen_urls)].reset_index(drop=True)
+    if len(new_df) == 0:
+        return new_df, latest_df
+
+    # a listing that may not be filtered is not remembered under the filter
+    if filtered:
+        update_seen(platts_seen_path, feed_key, res_df)
+    return new_df, res_df.reset_index(drop=True)
+
+
+def prefetch_platts(driver_pool, platts_url, platts_pages, platts_commodities, platts_engine, platts_http_url,
+                    platts_seen_path, url_api, url_workspace):
+    """
+    crawl platts and build the message of the latest listing, for the background prefetcher
+
+    :return: message string
+    """
+    _, latest_df = fetch_platts(driver_pool, platts_url, platts_pages, platts_commodities, platts_engine,
+                                platts_http_url, platts_seen_path)
+    return process_news_output(latest_df, url_api, url_workspace)
+
+
+def reply_platts(driver_pool, platts_url, platts_pages, platts_commodities, platts_engine, platts_http_url,
+                 platts_seen_path, url_api, url_workspace, user):
+    """
+    generate platts meassgae, only articles not returned before are included
+
+    :param driver_pool: pool of warm chrome drivers
+    :type driver_pool: driver_pool.DriverPool
+
+    :param platts_url: platts url
+    :type platts_url: str
+
+    :param platts_pages: maximum pages to load
+    :type platts_pages: int
+
+    :param platts_commodities: ids of the commodity filters to tick
+    :type platts_commodities: list
+
+    :param platts_engine: 'http' to fetch the listing without a browser, 'selenium' to crawl it
+    :type platts_engine: str
+
+    :param platts_http_url: url fetched by the http engine
+    :type platts_http_url: str
+
+    :param platts_seen_path: file keeping the articles seen before
+    :type platts_seen_path: str
+
     :param url_api: url shorten api
     :type url_api: str
 
@@ -222,25 +508,91 @@ def reply_platts(driver_path, platts_url, platts_pages, url_api, url_workspace,
     """
 
     user.send("生成Platts 新闻中...请稍候")
-    driver = initialise_platts_driver(platts_url, driver_path)
-    driver = click_options(driver)
-    res = []
-
-    for _ in range(platts_pages):
-        driver = load_more_page(driver)
-        time.sleep(2)
-        driver = scroll_down(driver)
-        time.sleep(2)
-        driver, res_df = extract_news(driver)
+    new_df, latest_df = fetch_platts(driver_pool, platts_url, platts_pages, platts_commodities, platts_engine,
+                                     platts_http_url, platts_seen_path)
 
-        res.append(res_df)
-    driver.quit()
+    if len(new_df) == 0:
+        if len(latest_df) == 0:
+            return "暂时没有Platts 新闻，请稍后再试"
+        msg = process_news_output(latest_df, url_api, url_workspace)
+        user.send("暂时没有新的Platts 新闻，上次的新闻如下：")
+        return msg
 
-    msg = process_news_output(res_df, url_api, url_workspace)
+    msg = process_news_output(new_df, url_api, url_workspace)
 
     user.send("最新Platts 新闻如下：")
     return msg
 
+
+def reply_platts_cached(platts_prefetcher, platts_max_age):
+    """
+    generate platts meassgae from the prefetched listing
+
+    :param platts_prefetcher: background prefetcher of the platts message, None if prefetching is off
+    :type platts_prefetcher: cache.Prefetcher
+
+    :param platts_max_age: maximum age of the prefetched listing in seconds
+    :type platts_max_age: int
+
+    :return: message string, None if there is no recent enough listing
+    """
+    if platts_prefetcher is None:
+        return None
+
+    cached = platts_prefetcher.get(platts_max_age)
+    if cached is None or not cached[0]:
+        return None
+
+    msg, updated_at = cached
+    return "最新Platts 新闻如下 (更新于 {})：\n".format(time.strftime('%H:%M', time.localtime(updated_at))) + msg
+
+def reply_status(stats, pool_stats, cache_stats=None, http_stats=None, outbox_stats=None, page_wait_stats=None):
+    """
+    generate worker lane, browser pool, cache, upstream api, email and page wait status message
+
+    :param stats: lane stats from the dispatcher
+    :type stats: dict
+
+    :param pool_stats: stats from the browser pool
+    :type pool_stats: dict
+
+    :param cache_stats: dictionary of cache name to cache stats
+    :type cache_stats: dict
+
+    :param http_stats: dictionary of host to request stats
+    :type http_stats: dict
+
+    :param outbox_stats: stats from the email outbox
+    :type outbox_stats: dict
+
+    :param page_wait_stats: dictionary of browser wait name to wait stats
+    :type page_wait_stats: dict
+
+    :return: text message
+    """
+    message = ""
+    for lane, lane_stats in stats.items():
+        message += "{}: 排队 {} / 运行中 {} / 已完成 {}\n平均等待 {} 秒, 最长等待 {} 秒\n========\n".format(
+            lane, lane_stats['queue_depth'], lane_stats['running'], lane_stats['completed'],
+            round(lane_stats['avg_wait'], 1), round(lane_stats['max_wait'], 1))
+    message += "浏览器: 运行 {} / 空闲 {} / 已回收 {}\n平均等待 {} 秒, 最长等待 {} 秒\n".format(
+        pool_stats['alive'], pool_stats['idle'], pool_stats['recycled'],
+        round(pool_stats['avg_wait'], 1), round(pool_stats['max_wait'], 1))
+    for name, cache_info in (cache_stats or {}).items():
+        message += "{}缓存: 命中率 {}%\n".format(name, round(cache_info['hit_ratio'] * 100, 1))
+    for host, host_stats in (http_stats or {}).items():
+        message += "{}: 请求 {} / 错误 {} / 平均 {} 毫秒\n".format(
+            host, host_stats['requests'], host_stats['errors'], round(host_stats['avg_latency'] * 1000))
+    if outbox_stats:
+        message += "邮件: 排队 {} / 已发送 {} / 失败 {}\n平均发送耗时 {} 秒, 最长 {} 秒\n".format(
+            outbox_stats['queue_depth'], outbox_stats['sent'], outbox_stats['failed'],
+            round(outbox_stats['avg_latency'], 1), round(outbox_stats['max_latency'], 1))
+    for name, wait_info in (page_wait_stats or {}).items():
+        message += "{}: 等待 {} 次 / 超时 {} 次\n平均 {} 秒, 最长 {} 秒\n".format(
+            name, wait_info['count'], wait_info['timeouts'], round(wait_info['avg'], 1), round(wait_info['max'], 1))
+    return message
+
+
 def reply_test():
     """
     return instruction for test
@@ -254,9 +606,10 @@ def reply_test():
               '3. platts -- 返回platts 新闻\n\n' \
               '4. 新闻 topic1, topic2 .. , topicX -- 根据所选主题，返回新闻\n' \
               '例：新闻 nba, finance\n\n' \
-              '5. 巴士 bus stop number，[bus1.bus2. .. .busX] -- 根据所选巴士站号码及巴士号码，返回接下来三班巴士抵达时间\n' \
-              '例：巴士 63291, 53.45.53m\n\n' \
+              '5. 巴士 bus stop number，[bus1.bus2. .. .busX]; .. -- 根据所选巴士站号码及巴士号码，返回接下来三班巴士抵达时间，多个车站用;分开\n' \
+              '例：巴士 63291, 53.45.53m; 55039\n\n' \
               '6. 工作 job1, job2 .. , jobX ^email@email.com -- 爬取相关工作并发送结果至指定邮箱\n'\
-              '例： 工作 data scientist, data analyst ^sunwrn@gmail.com\n'
+              '例： 工作 data scientist, data analyst ^sunwrn@gmail.com\n\n'\
+              '7. 状态 -- 返回任务队列状态\n'
 
     return message
\ No newline at end of file
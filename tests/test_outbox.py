@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+from email.mime.text import MIMEText
+import smtplib
+import socket
+import threading
+
+import pytest
+
+from outbox import Outbox
+
+controller = pytest.importorskip('aiosmtpd.controller')
+
+
+class Handler:
+    """
+    local SMTP stand-in, replies to each email with the next queued reply and then with 250
+    """
+
+    def __init__(self, replies=()):
+        self.replies = list(replies)
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.replies:
+            return self.replies.pop(0)
+        self.received.append(envelope.rcpt_tos)
+        return '250 OK'
+
+
+class Done:
+    """
+    on_done callback the test can wait for
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = 'not called'
+
+    def __call__(self, error):
+        self.error = error
+        self.event.set()
+
+    def wait(self):
+        assert self.event.wait(10), "email was neither sent nor given up"
+        return self.error
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(handler, port):
+    server = controller.Controller(handler, hostname='127.0.0.1', port=port)
+    server.start()
+    return server
+
+
+def message(to):
+    msg = MIMEText('jobs')
+    msg['From'] = 'bot@example.com'
+    msg['To'] = to
+    msg['Subject'] = 'jobs'
+    return msg
+
+
+@pytest.fixture
+def port():
+    return free_port()
+
+
+def start_outbox(port):
+    outbox = Outbox('127.0.0.1', port, None, None, False, retry_delay=0.1)
+    outbox.start()
+    return outbox
+
+
+def test_delivers_and_calls_on_done(port):
+    handler = Handler()
+    server = start_server(handler, port)
+    try:
+        outbox = start_outbox(port)
+        done = Done()
+        outbox.enqueue(message('a@example.com'), done)
+
+        assert done.wait() is None
+        assert handler.received == [['a@example.com']]
+        assert outbox.stats()['sent'] == 1
+    finally:
+        server.stop()
+
+
+def test_retries_transient_reply(port):
+    handler = Handler(['451 try again later'])
+    server = start_server(handler, port)
+    try:
+        outbox = start_outbox(port)
+        done = Done()
+        outbox.enqueue(message('a@example.com'), done)
+
+        assert done.wait() is None
+        assert handler.received == [['a@example.com']]
+        assert outbox.stats()['retries'] == 1
+    finally:
+        server.stop()
+
+
+def test_gives_up_on_permanent_reply(port):
+    handler = Handler(['550 mailbox unavailable'])
+    server = start_server(handler, port)
+    try:
+        outbox = start_outbox(port)
+        done = Done()
+        outbox.enqueue(message('a@example.com'), done)
+
+        error = done.wait()
+        assert isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 550
+        assert handler.received == []
+        stats = outbox.stats()
+        assert stats['failed'] == 1 and stats['retries'] == 0
+    finally:
+        server.stop()
+
+
+def test_reconnects_after_server_dropped_connection(port):
+    handler = Handler()
+    server = start_server(handler, port)
+    outbox = start_outbox(port)
+    done = Done()
+    outbox.enqueue(message('a@example.com'), done)
+    assert done.wait() is None
+
+    # the kept connection is gone once the server restarts
+    server.stop()
+    server = start_server(handler, port)
+    try:
+        done = Done()
+        outbox.enqueue(message('b@example.com'), done)
+
+        assert done.wait() is None
+        assert handler.received == [['a@example.com'], ['b@example.com']]
+        assert outbox.stats()['connects'] == 2
+    finally:
+        server.stop()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import pytest
+
+from platts import extract_news, parse_news_html
+
+pytest.importorskip('lxml')
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'platts_listing.html')
+BASE_URL = 'https://www.spglobal.com/platts/en/market-insights/latest-news'
+
+
+class RowsDriver:
+    """
+    stands in for the browser, returning the rows EXTRACT_NEWS_JS would return
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute_script(self, script, *args):
+        return self.rows
+
+
+def load_fixture():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+# what EXTRACT_NEWS_JS returns for the fixture, link.href is always absolute in the browser
+BROWSER_ROWS = [
+    ['Crude futures rise as OPEC+ weighs deeper cuts', 'Oil', '18 Oct 2026',
+     'https://www.spglobal.com/platts/en/market-insights/latest-news/oil/101820-crude-futures-rise'],
+    ['VLCC rates firm on Middle East demand', 'Shipping', '18 Oct 2026',
+     'https://www.spglobal.com/platts/en/market-insights/latest-news/shipping/101820-vlcc-rates'],
+    ['Podcast: LNG outlook for the winter', None, None,
+     'https://www.spglobal.com/platts/en/market-insights/podcasts/focus/101720-lng-outlook'],
+]
+
+
+def test_parse_news_html_matches_extract_news():
+    res_df = parse_news_html(load_fixture(), base_url=BASE_URL)
+    _, browser_df = extract_news(RowsDriver(BROWSER_ROWS))
+
+    assert list(res_df.columns) == ['title', 'topic', 'date', 'url']
+    # the item without a link and the element that is not a news item are skipped
+    pd.testing.assert_frame_equal(res_df, browser_df)
+
+
+def test_parse_news_html_without_base_url_keeps_links():
+    res_df = parse_news_html(load_fixture())
+
+    assert res_df['url'].tolist()[0] == '/platts/en/market-insights/latest-news/oil/101820-crude-futures-rise'
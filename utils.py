@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 
-from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph, Table, TableStyle
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
 from reportlab.lib import colors
+from cache import ShortUrlCache
+from concurrent.futures import ThreadPoolExecutor
+from http_client import http_client
 import requests, json
+import io
+import re
+from xml.sax.saxutils import escape
 
 import smtplib
 from email.mime.multipart import MIMEMultipart
@@ -14,66 +19,123 @@ from os.path import basename
 from email.mime.application import MIMEApplication
 
 
-def create_pdf(df, name):
+# shared by every pdf, building a stylesheet per call or per cell is slow
+PDF_MARGIN = 5
+PDF_CELL_STYLE = getSampleStyleSheet()["Normal"]
+PDF_TABLE_STYLE = TableStyle([
+    ('INNERGRID', (0, 0), (-1, -1), 0.25, colors.black),
+    ('BOX', (0, 0), (-1, -1), 0.25, colors.black),
+])
+# default table cell padding
+PDF_CELL_PADDING = (6, 3)
+
+
+def create_pdf(df, name=None):
     """
-    create a pdf for the dataframe
+    create a pdf for the dataframe, rows are laid out once and split across A4 pages,
+    each page repeats the header
 
     :param df: any dataframe
     :type df: pandas.DataFrame
 
-    :param name: name of the result pdf
+    :param name: name of the result pdf, None to render it in memory
     :type: str
 
-    :return: None
+    :return: None, or the pdf buffer when rendered in memory
     """
-    # setup the canvas
-    width = A4[0]
-    styles = getSampleStyleSheet()
+    # setup the page, the frame keeps 6 points of padding on each side
+    width, height = A4
+    frame_width = width - 2 * PDF_MARGIN - 12
+    frame_height = height - 2 * PDF_MARGIN - 12
+    col_width = frame_width / df.shape[1]
+    text_width = col_width - 2 * PDF_CELL_PADDING[0]
+
+    def row_height(row):
+        return max(i.wrap(text_width, frame_height)[1] for i in row) + 2 * PDF_CELL_PADDING[1]
 
     # fillna with N.A.
     df = df.fillna("N.A.")
 
-    # process content of the dataframe to make each element a paragraph object
-    content = [list(i) for i in df.values]
-    res_content = []
-    for i in content:
-        _temp = []
-        for j in i:
-            _temp.append(Paragraph(j, styles["Normal"]))
-        res_content.append(_temp)
-
     # process header of the dataframe
-    header = [Paragraph("<b>" + i + "</b>", styles["Normal"]) for i in df.columns.tolist()]
-
-    # form the final list to be feed into table
-    full_content = [header] + res_content
-
-    # create the table and set format
-    col_width = [(width - 10) / df.shape[1]] * df.shape[1]
-    table = Table(full_content, colWidths=col_width)
-    table.setStyle(TableStyle([
-        ('INNERGRID', (0, 0), (-1, -1), 0.25, colors.black),
-        ('BOX', (0, 0), (-1, -1), 0.25, colors.black),
-    ]))
-
-    # foo pdf, just for getting the row sum
-    # THIS IS GENIUS!!
-    foo = canvas.Canvas("foo.pdf", pagesize=[width, 200000])
-
-    # get the actual table height and page height, wrapOn function
-    # will return the actual height and width of the table
-    table_height = table.wrapOn(foo, width, 2000000)[1]
-    page_height = table_height + 10
-
-    # get the actual table height
-    c = canvas.Canvas("{}.pdf".format(name), pagesize=[width, page_height])
-    table.wrapOn(c, width, page_height)
-    table.drawOn(c, 5, 5)
-    c.save()
-
-def shorten_url(url, url_shorten_api, url_shorten_workspace):
+    header = [Paragraph("<b>" + i + "</b>", PDF_CELL_STYLE) for i in df.columns.tolist()]
+    header_height = row_height(header)
+    max_text_height = frame_height - header_height - 2 * PDF_CELL_PADDING[1]
+
+    def clip(paragraph):
+        # a row cannot be split across pages, cut text that would not fit on a page by itself
+        text = paragraph.getPlainText()
+        text_height = paragraph.wrap(text_width, frame_height)[1]
+        while text_height > max_text_height and text:
+            text = text[:int(len(text) * max_text_height / text_height * 0.95)]
+            paragraph = Paragraph(escape(text) + "...", PDF_CELL_STYLE)
+            text_height = paragraph.wrap(text_width, frame_height)[1]
+        return paragraph
+
+    # process content of the dataframe to make each element a paragraph object, and fill the pages
+    pages = []
+    rows, heights = [header], [header_height]
+    for i in df.itertuples(index=False):
+        row = [Paragraph(str(j), PDF_CELL_STYLE) for j in i]
+        height_ = row_height(row)
+        if height_ > frame_height - header_height:
+            row = [clip(j) for j in row]
+            height_ = row_height(row)
+
+        if len(rows) > 1 and sum(heights) + height_ > frame_height:
+            pages.append((rows, heights))
+            rows, heights = [header], [header_height]
+        rows.append(row)
+        heights.append(height_)
+    pages.append((rows, heights))
+
+    # one table per page, the measured row heights are reused
+    story = []
+    for rows, heights in pages:
+        if story:
+            story.append(PageBreak())
+        table = Table(rows, colWidths=[col_width] * df.shape[1], rowHeights=heights)
+        table.setStyle(PDF_TABLE_STYLE)
+        story.append(table)
+
+    output = io.BytesIO() if name is None else "{}.pdf".format(name)
+    doc = SimpleDocTemplate(output, pagesize=A4, leftMargin=PDF_MARGIN, rightMargin=PDF_MARGIN,
+                            topMargin=PDF_MARGIN, bottomMargin=PDF_MARGIN)
+    doc.build(story)
+
+    if name is None:
+        output.seek(0)
+        return output
+
+# shortened urls shared by news and platts, set up by init_url_cache
+url_cache = None
+
+# number of urls shortened at the same time
+shorten_workers = 8
+
+
+def init_url_cache(path, memory_size, disk_size):
+    """
+    set up the shortened url cache used by shorten_url
+
+    :param path: SQLite file of the cache
+    :type path: str
+
+    :param memory_size: number of urls kept in memory
+    :type memory_size: int
+
+    :param disk_size: number of urls kept on disk
+    :type disk_size: int
+
+    :return: ShortUrlCache
+    """
+    global url_cache
+    url_cache = ShortUrlCache(path, memory_size, disk_size)
+    return url_cache
+
+
+def shorten_url(url, url_shorten_api, url_shorten_workspace, timeout=5):
     """
-    shorten url
+    shorten url, the original url is returned when shortening fails
 
     :param url: url to be shorten
     :type url: str
@@ -84,9 +146,20 @@ def shorten_url(url, url_shorten_api, url_shorten_workspace):
     :param url_shorten_workspace: URL Link Shortener workspace ID
     :type url_shorten_workspace: str
 
+    :param timeout: request timeout in seconds
+    :type timeout: float
+
     :return: shortened url
     """
 
+    if not url:
+        return url
+
+    if url_cache is not None:
+        short_url = url_cache.get(url)
+        if short_url is not None:
+            return short_url
+
     linkRequest = {
         "destination": url,
         "domain": {"fullName": "rebrand.ly"}
@@ -98,13 +171,25 @@ def shorten_url(url, url_shorten_api, url_shorten_workspace):
         "workspace": url_shorten_workspace
     }
 
-    r = requests.post("https://api.rebrandly.com/v1/links",
-                      data=json.dumps(linkRequest),
-                      headers=requestHeaders)
+    try:
+        # creating a link is not idempotent, it is only retried when the request never reached the server
+        r = http_client.request('POST', "https://api.rebrandly.com/v1/links",
+                                idempotent=False,
+                                data=json.dumps(linkRequest),
+                                headers=requestHeaders,
+                                timeout=timeout)
+    except requests.RequestException:
+        return url
 
     if (r.status_code == requests.codes.ok):
-        link = r.json()
-        return link["shortUrl"]
+        try:
+            short_url = json.loads(r.content)["shortUrl"]
+        except (ValueError, KeyError, TypeError):
+            # an unexpected body must not fail the whole reply
+            return url
+        if url_cache is not None:
+            url_cache.set(url, short_url)
+        return short_url
     else:
         return url
 
@@ -125,9 +210,16 @@ def process_news_output(res_df, url_shorten_api, url_shorten_workspace):
     :return: processed string
     """
 
-    res_df['shorten_url'] = res_df['url'].apply(lambda x: shorten_url(x, url_shorten_api, url_shorten_workspace))
-    res_df = res_df.loc[-res_df['shorten_url'].str.startswith('https')].reset_index(drop=True)
-    res_df['shorten_url'] = 'https://' + res_df['shorten_url']
+    # shorten all urls in parallel, map keeps the input order
+    urls = list(res_df['url'])
+    if urls:
+        with ThreadPoolExecutor(max_workers=min(shorten_workers, len(urls))) as executor:
+            shortened = list(executor.map(lambda x: shorten_url(x, url_shorten_api, url_shorten_workspace), urls))
+    else:
+        shortened = []
+
+    # the shortener returns urls without scheme, failed ones fall back to the original url
+    res_df['shorten_url'] = [i if not i or i.startswith('http') else 'https://' + i for i in shortened]
 
     msg = ''
 
@@ -138,9 +230,54 @@ def process_news_output(res_df, url_shorten_api, url_shorten_workspace):
     return msg
 
 
-def send_email(sender_email, sender_password, receiver_email, subject, body, attachement_path):
+def build_email(sender_email, receiver_email, subject, body, attachement, attachement_name=None):
+    """
+    Build an email with an attachement
+
+    :param sender_email: sender's email
+    :type sender_email: str
+
+    :param receiver_email: receivers email
+    :type receiver_email: str
+
+    :param subject: email subject
+    :type subject: str
+
+    :param body: email body
+    :type body: str
+
+    :param attachement: path for file to be sent over, or an in-memory buffer
+    :type attachement: str or io.BytesIO
+
+    :param attachement_name: file name of the attachement, required for a buffer
+    :type attachement_name: str
+
+    :return: MIMEMultipart
+    """
+    # instance of MIMEMultipart
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = receiver_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+
+    # read the file to be sent
+    if isinstance(attachement, str):
+        attachement_name = attachement_name or basename(attachement)
+        with open(attachement, 'rb') as fil:
+            content = fil.read()
+    else:
+        content = attachement.getvalue()
+
+    part = MIMEApplication(content, Name=attachement_name)
+    part['Content-Disposition'] = 'attachment; filename="%s"' % attachement_name
+    msg.attach(part)
+    return msg
+
+
+def send_email(sender_email, sender_password, receiver_email, subject, body, attachement, attachement_name=None):
     """
-    Send results to an email
+    Send results to an email over a new SMTP session, see outbox.Outbox to reuse one
 
     :param sender_email: sender's email
     :type sender_email: str
@@ -157,8 +294,11 @@ def send_email(sender_email, sender_password, receiver_email, subject, body, att
     :param body: email body
     :type body: str
 
-    :param attachement_path: path for file to be sent over
-    :type attachement_path: str
+    :param attachement: path for file to be sent over, or an in-memory buffer
+    :type attachement: str or io.BytesIO
+
+    :param attachement_name: file name of the attachement, required for a buffer
+    :type attachement_name: str
 
     :return: None
     """
@@ -167,20 +307,24 @@ def send_email(sender_email, sender_password, receiver_email, subject, body, att
     s.starttls()
     s.login(sender_email, sender_password)
 
-    # instance of MIMEMultipart
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = receiver_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    # open the file to be sent
-    with open(attachement_path, 'rb') as fil:
-        part = MIMEApplication(fil.read(), Name=basename(attachement_path))
-        part['Content-Disposition'] = 'attachment; filename="%s"' % basename(attachement_path)
-        msg.attach(part)
+    msg = build_email(sender_email, receiver_email, subject, body, attachement, attachement_name)
 
     # send email
     s.sendmail(sender_email, receiver_email, msg.as_string())
     # terminating the session
     s.quit()
+
+
+def safe_file_name(text, extension):
+    """
+    Build a file name from free text such as a WeChat message
+
+    :param text: any text
+    :type text: str
+
+    :param extension: file extension without the dot
+    :type extension: str
+
+    :return: file name
+    """
+    return '{}.{}'.format(re.sub(r'[^\w-]+', '_', text).strip('_')[:50] or 'file', extension)
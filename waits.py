@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException,
+                                        TimeoutException, WebDriverException)
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record_wait(name, elapsed, timed_out=False):
+    """
+    Record how long a wait took, so the timeouts can be tuned from data
+
+    :param name: name of the wait
+    :type name: str
+
+    :param elapsed: seconds waited
+    :type elapsed: float
+
+    :param timed_out: whether the condition was never met
+    :type timed_out: bool
+
+    :return: None
+    """
+    with _stats_lock:
+        stats = _stats.setdefault(name, {'count': 0, 'timeouts': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['timeouts'] += int(timed_out)
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+
+    if timed_out:
+        logger.warning("gave up waiting for %s after %.2fs", name, elapsed)
+    else:
+        logger.info("waited %.2fs for %s", elapsed, name)
+
+
+def wait_stats():
+    """
+    Count, timeouts, average and maximum seconds of every named wait
+
+    :return: dictionary of wait name to stats dictionary
+    """
+    with _stats_lock:
+        return {name: dict(stats, avg=stats['total'] / stats['count']) for name, stats in _stats.items()}
+
+
+def wait_until(driver, condition, name, timeout=15, interval=0.1, max_interval=1.0, backoff=1.5):
+    """
+    Poll a condition until it returns a truthy value, backing off between polls
+
+    :param driver: webdriver
+    :type driver: webdriver
+
+    :param condition: function taking the driver, element lookups that fail count as not ready
+    :type condition: callable
+
+    :param name: name of the wait for logging
+    :type name: str
+
+    :param timeout: seconds to wait before raising TimeoutException
+    :type timeout: float
+
+    :param interval: seconds between the first polls
+    :type interval: float
+
+    :param max_interval: maximum seconds between polls
+    :type max_interval: float
+
+    :param backoff: factor the poll interval grows by
+    :type backoff: float
+
+    :return: value returned by the condition
+    """
+    start = time.time()
+    while True:
+        try:
+            value = condition(driver)
+        except (NoSuchElementException, StaleElementReferenceException):
+            value = None
+
+        elapsed = time.time() - start
+        if value:
+            record_wait(name, elapsed)
+            return value
+
+        if elapsed >= timeout:
+            record_wait(name, elapsed, timed_out=True)
+            raise TimeoutException("timed out waiting for {}".format(name))
+
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * backoff, max_interval)
+
+
+def staleness_of(element):
+    """
+    Condition met once the element is removed from the page, e.g. after a navigation
+
+    :param element: web element from the previous page
+    :type element: WebElement
+
+    :return: condition function
+    """
+
+    def condition(driver):
+        try:
+            element.is_enabled()
+            return False
+        except (StaleElementReferenceException, WebDriverException):
+            return True
+
+    return condition
+
+
+def elements_present(xpath):
+    """
+    Condition met once at least one element matches the xpath
+
+    :param xpath: xpath of the elements
+    :type xpath: str
+
+    :return: condition function returning the elements
+    """
+
+    def condition(driver):
+        return driver.find_elements_by_xpath(xpath)
+
+    return condition